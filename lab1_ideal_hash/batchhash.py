@@ -0,0 +1,78 @@
+import collections
+from array import array
+from typing import *
+import numpy as np
+
+
+LIMB_BITS = 16
+
+
+def hash_dtype(prime: int) -> type:
+    """
+    uint64 is enough while primes fit in 48 bits (see mul_mod), bigger primes need python integers
+    """
+    return np.uint64 if prime < 2 ** (3 * LIMB_BITS) else object
+
+
+def mul_mod(x: np.ndarray, a: Union[int, np.ndarray], prime: int) -> np.ndarray:
+    """
+    x * a % prime for x, a < prime without uint64 overflow.
+    Above 32 bits a is multiplied by 16 bit limbs, so every intermediate value stays below 2 ** 64
+    """
+    if x.dtype == object or prime < 2 ** (2 * LIMB_BITS):
+        return x * a % prime
+
+    res = np.zeros_like(x)
+    for shift in (2 * LIMB_BITS, LIMB_BITS, 0):
+        limb = (a >> shift) & (2 ** LIMB_BITS - 1)
+        res = ((res << LIMB_BITS) % prime + x * limb % prime) % prime
+
+    return res
+
+
+def poly_hash_rows(matrix: np.ndarray, a: Union[int, np.ndarray], prime: int) -> np.ndarray:
+    """
+    Evaluates poly_hash for every row of matrix at once, going through its columns with Horner's rule.
+    a is either one base for all rows or an array with base of each row
+    """
+    res = np.zeros(matrix.shape[0], dtype=matrix.dtype)
+
+    for column in range(matrix.shape[1] - 1, -1, -1):
+        res = mul_mod((res + matrix[:, column]) % prime, a, prime)
+
+    return res
+
+
+def group_by_length(vectors: Sequence[Sequence[int]]) -> Dict[int, List[int]]:
+    groups = collections.defaultdict(list)
+
+    for i, vector in enumerate(vectors):
+        groups[len(vector)].append(i)
+
+    return groups
+
+
+def find_slots(vectors: Sequence[Sequence[int]], a: int, b: int, prime: int, max_hash: int,
+               params: array, offsets: array) -> np.ndarray:
+    """
+    Computes slot of every vector in flat two level table, -1 if its bucket is empty.
+    Vectors of equal length are hashed together as one matrix
+    """
+    dtype = hash_dtype(prime)
+    params = np.frombuffer(params, dtype=np.uint64).reshape(-1, 3).astype(dtype)
+    offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64)
+    slots = np.full(len(vectors), -1, dtype=np.int64)
+
+    for length, indices in group_by_length(vectors).items():
+        matrix = np.array([vectors[i] for i in indices], dtype=np.uint64).reshape(len(indices), length)
+        matrix = matrix.astype(dtype) % prime
+
+        buckets = ((poly_hash_rows(matrix, a, prime) + b) % prime % max_hash).astype(np.int64)
+        bucket_a, bucket_b, bucket_size = params[buckets, 0], params[buckets, 1], params[buckets, 2]
+        filled = bucket_size != 0
+
+        second = (poly_hash_rows(matrix[filled], bucket_a[filled], prime) + bucket_b[filled]) % prime
+        indices = np.array(indices, dtype=np.int64)
+        slots[indices[filled]] = offsets[buckets[filled]] + (second % bucket_size[filled]).astype(np.int64)
+
+    return slots
@@ -0,0 +1,73 @@
+import random
+import statistics
+import sys
+import time
+from array import array
+from typing import *
+from utils.staff import Division
+from utils import rand_str
+from idealhash import HashMap
+from minperfecthash import MinimalHashMap
+from cuckoohash import CuckooHashMap
+
+
+LENGTH = 10 ** 4
+QUERIES = 10 ** 4
+MAP_TYPES = [HashMap, MinimalHashMap, CuckooHashMap, dict]
+
+
+def gen_names(count: int) -> List[str]:
+    names = set()
+
+    while len(names) < count:
+        names.add(rand_str(random.randint(5, 15)))
+
+    return list(names)
+
+
+def table_bytes(mapping: Any) -> int:
+    """
+    Memory taken by lists and arrays of mapping itself, without keys and values
+    """
+    if isinstance(mapping, dict):
+        return sys.getsizeof(mapping)
+
+    return sum(sys.getsizeof(attr) for attr in vars(mapping).values() if isinstance(attr, (list, array)))
+
+
+def lookup_latencies(mapping: Any, keys: List[Any]) -> List[float]:
+    latencies = []
+
+    for key in keys:
+        start = time.perf_counter()
+        _ = key in mapping
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def map_efficiency_test(map_type: type, elements: List[Tuple[Any, Any]],
+                        queries: List[Any]) -> Tuple[float, float, List[float]]:
+    start = time.perf_counter()
+    mapping = map_type(elements)
+    build_time = time.perf_counter() - start
+
+    return (build_time, table_bytes(mapping) / len(elements), lookup_latencies(mapping, queries))
+
+
+if __name__ == '__main__':
+    names = gen_names(2 * LENGTH)
+    elements = [(Division(name), None) for name in names[:LENGTH]]
+    queries = [Division(random.choice(names)) for _ in range(QUERIES)]
+
+    print(f'{LENGTH} DIVISION KEYS, {QUERIES} QUERIES (HALF OF THEM ABSENT)')
+
+    for map_type in MAP_TYPES:
+        build_time, bytes_per_key, latencies = map_efficiency_test(map_type, elements, queries)
+        percentiles = statistics.quantiles(latencies, n=100)
+
+        print(f'RUN TEST FOR {map_type.__name__}:')
+        print(f'BUILD TIME: {build_time:.3f} s')
+        print(f'BYTES PER KEY: {bytes_per_key:.1f}')
+        print(f'LOOKUP MEAN: {statistics.mean(latencies) * 10 ** 6:.2f} us, '
+              f'P50: {percentiles[49] * 10 ** 6:.2f} us, P99: {percentiles[98] * 10 ** 6:.2f} us')
@@ -0,0 +1,199 @@
+import random
+import reprlib
+from utils import find_greater_prime, to_vector, PowerTable
+from idealhash import MAX_ATTEMPTS, random_hash_params
+from typing import *
+
+
+TABLE_COUNT = 2
+STASH_SIZE = 4
+MAX_LOAD = 0.45
+MIN_CAPACITY = 8
+LOOP_FACTOR = 6
+
+
+class CuckooHashMap:
+    def __init__(self, elements: Optional[Iterable[Tuple[Any, Any]]] = None, table_count: int = TABLE_COUNT,
+                 stash_size: int = STASH_SIZE, max_load: float = MAX_LOAD, max_attempts: int = MAX_ATTEMPTS) -> None:
+        """
+        Cuckoo hashing: key lives in one of table_count tables, in the slot given by hash function of that table,
+        or in a small stash, so lookup checks at most table_count slots and the stash.
+        Insert evicts occupants of the key's slots for up to LOOP_FACTOR * log(capacity) moves,
+        the key left homeless goes to the stash, and when the stash overflows all tables are rehashed
+        with new functions. Tables grow twice when load exceeds max_load.
+
+        Tables are kept in one flat _entries list: table t owns slots t * capacity ... (t + 1) * capacity - 1
+        """
+        self._table_count = table_count
+        self._stash_size = stash_size
+        self._max_load = max_load
+        self._max_attempts = max_attempts
+        self._rehashes = 0
+
+        elements = [] if elements is None else list(elements)
+        capacity = MIN_CAPACITY
+        while len(elements) > max_load * table_count * capacity:
+            capacity *= 2
+
+        self._capacity = 0
+        self._entries = []
+        self._stash = []
+        self._length = 0
+        self._rehash(capacity, elements)
+
+    def _set_hash_funcs(self) -> None:
+        self._params = [random_hash_params(self._prime) for _ in range(self._table_count)]
+        self._powers = [PowerTable(a, self._prime) for a, _ in self._params]
+
+    def _slots(self, vector: Sequence[int]) -> List[int]:
+        """
+        Returns slot of vector in every table
+        """
+        return [t * self._capacity + ((powers.poly_hash(vector) + b) % self._prime) % self._capacity
+                for t, (powers, (_, b)) in enumerate(zip(self._powers, self._params))]
+
+    def _place(self, entry: Tuple[Any, Any]) -> Optional[Tuple[Any, Any]]:
+        """
+        Puts entry into the tables evicting other entries, returns entry which is left without slot, if any
+        """
+        prev_slot = -1
+
+        for _ in range(LOOP_FACTOR * self._capacity.bit_length()):
+            slots = self._slots(to_vector(entry[0]))
+
+            for slot in slots:
+                if self._entries[slot] is None:
+                    self._entries[slot] = entry
+                    return None
+
+            slot = random.choice([slot for slot in slots if slot != prev_slot] or slots)
+            entry, self._entries[slot] = self._entries[slot], entry
+            prev_slot = slot
+
+        return entry
+
+    def _rehash(self, capacity: int, elements: List[Tuple[Any, Any]]) -> None:
+        """
+        Rebuilds tables of capacity slots from elements, updating values of equal keys
+        """
+        self._capacity = capacity
+        self._prime = find_greater_prime(capacity ** 2)
+
+        for _ in range(self._max_attempts):
+            self._set_hash_funcs()
+            self._entries = [None for _ in range(self._table_count * capacity)]
+            self._stash = []
+            self._length = 0
+
+            for key, value in elements:
+                if not self._put(key, value):
+                    break
+            else:
+                return
+
+            self._rehashes += 1
+
+        raise RuntimeError(f'Could not find cuckoo hash functions in {self._max_attempts} attempts')
+
+    def _put(self, key: Any, value: Any) -> bool:
+        """
+        Inserts or updates key without rehashing, returns False if the stash overflows
+        (the entry is still kept in the stash, so no entry is lost)
+        """
+        found = self._find(key)
+        if found != -1:
+            self._set(found, (key, value))
+            return True
+
+        return self._add(key, value)
+
+    def _add(self, key: Any, value: Any) -> bool:
+        """
+        Inserts absent key, returns False if the stash overflows
+        """
+        self._length += 1
+        homeless = self._place((key, value))
+
+        if homeless is not None:
+            self._stash.append(homeless)
+
+        return len(self._stash) <= self._stash_size
+
+    def _find(self, key: Any) -> int:
+        """
+        Returns slot of key, slots after the tables are stash positions, -1 if there is no such key
+        """
+        for slot in self._slots(to_vector(key)):
+            entry = self._entries[slot]
+            if entry is not None and entry[0] == key:
+                return slot
+
+        for i, (stash_key, _) in enumerate(self._stash):
+            if stash_key == key:
+                return len(self._entries) + i
+
+        return -1
+
+    def _get(self, slot: int) -> Tuple[Any, Any]:
+        return self._entries[slot] if slot < len(self._entries) else self._stash[slot - len(self._entries)]
+
+    def _set(self, slot: int, entry: Tuple[Any, Any]) -> None:
+        if slot < len(self._entries):
+            self._entries[slot] = entry
+        else:
+            self._stash[slot - len(self._entries)] = entry
+
+    def insert(self, key: Any, value: Any = None) -> None:
+        found = self._find(key)
+        if found != -1:
+            self._set(found, (key, value))
+            return
+
+        # only a new key can push the load over its limit
+        if self._length + 1 > self._max_load * self._table_count * self._capacity:
+            self._rehash(2 * self._capacity, list(self) + [(key, value)])
+        elif not self._add(key, value):
+            self._rehash(self._capacity, list(self))
+
+    def remove(self, key: Any) -> None:
+        slot = self._find(key)
+
+        if slot != -1:
+            if slot < len(self._entries):
+                self._entries[slot] = None
+            else:
+                self._stash.pop(slot - len(self._entries))
+            self._length -= 1
+
+    def get_many(self, keys: Sequence[Any], default: Any = None) -> List[Any]:
+        return [self._get(slot)[1] if slot != -1 else default for slot in map(self._find, keys)]
+
+    def contains_many(self, keys: Sequence[Any]) -> List[bool]:
+        return [slot != -1 for slot in map(self._find, keys)]
+
+    @property
+    def rehashes(self) -> int:
+        return self._rehashes
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        for entry in self._entries:
+            if entry is not None:
+                yield entry
+
+        yield from self._stash
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))})'
+
+    def __contains__(self, key: Any) -> bool:
+        return self._find(key) != -1
+
+    def __getitem__(self, key: Any) -> Any:
+        slot = self._find(key)
+        if slot != -1:
+            return self._get(slot)[1]
+        else:
+            raise KeyError
@@ -0,0 +1,186 @@
+import reprlib
+from utils import find_greater_prime, to_vector, poly_hash, PowerTable
+from idealhash import MAX_ATTEMPTS, random_hash_params, solve_bucket
+from typing import *
+
+
+GROWTH = 1
+MIN_CAPACITY = 4
+
+
+class Bucket:
+    def __init__(self) -> None:
+        self.capacity = 0
+        self.count = 0
+        self.a = self.b = 0
+        self.slots = []
+
+    def slot(self, vector: Sequence[int], prime: int) -> int:
+        return ((poly_hash(vector, self.a, prime) + self.b) % prime) % len(self.slots)
+
+    def entries(self) -> Iterator[Tuple[Any, Any]]:
+        for entry in self.slots:
+            if entry is not None:
+                yield entry
+
+    def rebuild(self, entries: List[Tuple[Any, Any]], capacity: int, prime: int, max_attempts: int) -> None:
+        """
+        Builds collision-free table of 2 * capacity ** 2 slots for entries
+        """
+        size = 2 * capacity ** 2
+        self.a, self.b, _, slots = solve_bucket([to_vector(key) for key, _ in entries], prime, max_attempts, size)
+        self.capacity, self.count = capacity, len(entries)
+        self.slots = [None for _ in range(size)]
+
+        for entry, slot in zip(entries, slots):
+            self.slots[slot] = entry
+
+
+def table_size(capacity: int) -> int:
+    return 2 * capacity ** 2
+
+
+class DynamicHashMap:
+    def __init__(self, elements: Optional[Iterable[Tuple[Any, Any]]] = None,
+                 growth: float = GROWTH, max_attempts: int = MAX_ATTEMPTS) -> None:
+        """
+        Dynamic perfect hashing by Dietzfelbinger et al.
+        Bucket j keeps up to capacity_j keys in 2 * capacity_j ** 2 slots, so lookups take two hash evaluations.
+        Insert into a full bucket doubles its capacity and rebuilds only that bucket.
+        After threshold = (1 + growth) * n updates, or when total space of buckets exceeds its bound,
+        whole map is rebuilt
+        """
+        self._growth = growth
+        self._max_attempts = max_attempts
+        self._rehash([] if elements is None else list(elements))
+
+    def _rehash(self, elements: List[Tuple[Any, Any]]) -> None:
+        """
+        Rebuilds whole map from elements, if it fails with RuntimeError the map is left as it was
+        """
+        state = dict(self.__dict__)
+
+        try:
+            self._build(elements)
+        except RuntimeError:
+            self.__dict__.clear()
+            self.__dict__.update(state)
+            raise
+
+    def _build(self, elements: List[Tuple[Any, Any]]) -> None:
+        self._threshold = int((1 + self._growth) * max(len(elements), MIN_CAPACITY))
+        self._updates = 0
+        self._prime = find_greater_prime(self._threshold ** 2)
+        self._space_bound = 36 * self._threshold
+
+        for _ in range(self._max_attempts):
+            self._a, self._b = random_hash_params(self._prime)
+            self._powers = PowerTable(self._a, self._prime)
+            bucket_entries = self._split(elements)
+            self._space = sum(table_size(2 * len(entries)) for entries in bucket_entries)
+
+            if self._space <= self._space_bound:
+                break
+        else:
+            raise RuntimeError(f'Could not find first level hash function in {self._max_attempts} attempts')
+
+        self._buckets = [Bucket() for _ in range(self._threshold)]
+        self._length = 0
+
+        for bucket, entries in zip(self._buckets, bucket_entries):
+            if len(entries) > 0:
+                bucket.rebuild(entries, 2 * len(entries), self._prime, self._max_attempts)
+                self._length += len(entries)
+
+    def _bucket(self, vector: Sequence[int]) -> int:
+        return ((self._powers.poly_hash(vector) + self._b) % self._prime) % self._threshold
+
+    def _split(self, elements: List[Tuple[Any, Any]]) -> List[List[Tuple[Any, Any]]]:
+        bucket_entries = [[] for _ in range(self._threshold)]
+
+        for key, value in elements:
+            entries = bucket_entries[self._bucket(to_vector(key))]
+
+            for i, (tmp_key, _) in enumerate(entries):
+                if key == tmp_key:
+                    entries[i] = (key, value)
+                    break
+            else:
+                entries.append((key, value))
+
+        return bucket_entries
+
+    def _find(self, key: Any) -> Tuple[Bucket, Sequence[int], int]:
+        """
+        Returns bucket of key, key vector and slot of key in the bucket (-1 if bucket has no table)
+        """
+        vector = to_vector(key)
+        bucket = self._buckets[self._bucket(vector)]
+
+        return (bucket, vector, bucket.slot(vector, self._prime) if bucket.capacity > 0 else -1)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        for bucket in self._buckets:
+            yield from bucket.entries()
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))})'
+
+    def __contains__(self, key: Any) -> bool:
+        bucket, _, slot = self._find(key)
+        return slot != -1 and bucket.slots[slot] is not None and bucket.slots[slot][0] == key
+
+    def __getitem__(self, key: Any) -> Any:
+        bucket, _, slot = self._find(key)
+        if slot != -1 and bucket.slots[slot] is not None and bucket.slots[slot][0] == key:
+            return bucket.slots[slot][1]
+        else:
+            raise KeyError
+
+    def insert(self, key: Any, value: Any = None) -> None:
+        bucket, vector, slot = self._find(key)
+
+        if slot != -1 and bucket.slots[slot] is not None and bucket.slots[slot][0] == key:
+            bucket.slots[slot] = (key, value)
+            return
+
+        # counters change only after the entry is placed, rebuilds fail with RuntimeError and keep the map as it was
+        if self._updates + 1 > self._threshold:
+            self._rehash(list(self) + [(key, value)])
+            return
+
+        if bucket.count < bucket.capacity:
+            if bucket.slots[slot] is None:
+                bucket.slots[slot] = (key, value)
+                bucket.count += 1
+            else:
+                bucket.rebuild(list(bucket.entries()) + [(key, value)], bucket.capacity,
+                               self._prime, self._max_attempts)
+        else:
+            capacity = 2 * max(bucket.capacity, 1)
+            space = self._space - table_size(bucket.capacity) + table_size(capacity)
+
+            if space > self._space_bound:
+                self._rehash(list(self) + [(key, value)])
+                return
+
+            bucket.rebuild(list(bucket.entries()) + [(key, value)], capacity, self._prime, self._max_attempts)
+            self._space = space
+
+        self._updates += 1
+        self._length += 1
+
+    def remove(self, key: Any) -> None:
+        bucket, _, slot = self._find(key)
+
+        if slot != -1 and bucket.slots[slot] is not None and bucket.slots[slot][0] == key:
+            bucket.slots[slot] = None
+            bucket.count -= 1
+            self._length -= 1
+
+            self._updates += 1
+            if self._updates > self._threshold:
+                self._rehash(list(self))
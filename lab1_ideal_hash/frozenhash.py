@@ -0,0 +1,153 @@
+import mmap
+import pickle
+import reprlib
+import struct
+import sys
+from array import array
+from utils import to_vector, poly_hash, PowerTable
+from idealhash import HashMap
+from typing import *
+
+
+MAGIC = b'FKSH'
+VERSION = 2
+
+# magic, version, prime, max_hash, a, b, length, slot count
+HEADER = struct.Struct('<4sIQQQQQQ')
+PARAMS = struct.Struct('<3Q')
+OFFSET = struct.Struct('<Q')
+KEY_LEN = struct.Struct('<I')
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+
+    return arr.tobytes()
+
+
+def freeze(mapping: HashMap, filename: str) -> None:
+    """
+    Writes built HashMap to filename: header, packed second level parameters, bucket offsets,
+    slot record offsets and one record (key length, pickled key, pickled value) per slot.
+    Empty slots have empty records
+    """
+    # noinspection PyProtectedMember
+    slot_count, params, offsets = len(mapping._keys), mapping._params, mapping._offsets
+    # noinspection PyProtectedMember
+    header = HEADER.pack(MAGIC, VERSION, mapping._prime, mapping._max_hash, mapping._a, mapping._b,
+                         len(mapping), slot_count)
+    record_offsets = array('Q', [0])
+
+    with open(filename, 'wb') as f:
+        f.write(header)
+        f.write(_le_bytes(params))
+        f.write(_le_bytes(offsets))
+        record_offsets_pos = f.tell()
+        f.write(bytes(OFFSET.size * (slot_count + 1)))
+
+        data_len = 0
+        # noinspection PyProtectedMember
+        for slot, key, value in mapping._iter_slots():
+            record_offsets.extend([data_len] * (slot + 1 - len(record_offsets)))
+
+            key_bytes = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+            value_bytes = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            f.write(KEY_LEN.pack(len(key_bytes)))
+            f.write(key_bytes)
+            f.write(value_bytes)
+            data_len += KEY_LEN.size + len(key_bytes) + len(value_bytes)
+
+            record_offsets.append(data_len)
+
+        record_offsets.extend([data_len] * (slot_count + 1 - len(record_offsets)))
+
+        f.seek(record_offsets_pos)
+        f.write(_le_bytes(record_offsets))
+
+
+class FrozenHashMap:
+    def __init__(self, filename: str) -> None:
+        """
+        Serves lookups straight from memory mapped file written by freeze,
+        unpickling only records of the slots it touches
+        """
+        with open(filename, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._prime, self._max_hash, a, self._b, self._length, slot_count = \
+            HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f'{filename} is not a frozen hash map of version {VERSION}')
+
+        self._powers = PowerTable(a, self._prime)
+        self._slot_count = slot_count
+        self._params_pos = HEADER.size
+        self._offsets_pos = self._params_pos + PARAMS.size * self._max_hash
+        self._records_pos = self._offsets_pos + OFFSET.size * self._max_hash
+        self._data_pos = self._records_pos + OFFSET.size * (slot_count + 1)
+
+    def __enter__(self) -> 'FrozenHashMap':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _record(self, slot: int) -> Tuple[int, int]:
+        start, end = struct.unpack_from('<2Q', self._mm, self._records_pos + OFFSET.size * slot)
+        return (self._data_pos + start, self._data_pos + end)
+
+    def _load_key(self, start: int) -> Tuple[Any, int]:
+        key_len = KEY_LEN.unpack_from(self._mm, start)[0]
+        key_start = start + KEY_LEN.size
+        return (pickle.loads(self._mm[key_start: key_start + key_len]), key_start + key_len)
+
+    def _find_record(self, key: Any) -> Optional[Tuple[int, int]]:
+        """
+        Returns bounds of pickled value of key
+        """
+        vector = to_vector(key)
+        bucket = ((self._powers.poly_hash(vector) + self._b) % self._prime) % self._max_hash
+        a, b, size = PARAMS.unpack_from(self._mm, self._params_pos + PARAMS.size * bucket)
+
+        if size == 0:
+            return None
+
+        offset = OFFSET.unpack_from(self._mm, self._offsets_pos + OFFSET.size * bucket)[0]
+        start, end = self._record(offset + ((poly_hash(vector, a, self._prime) + b) % self._prime) % size)
+
+        if start == end:
+            return None
+
+        slot_key, value_start = self._load_key(start)
+        return (value_start, end) if slot_key == key else None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        for slot in range(self._slot_count):
+            start, end = self._record(slot)
+
+            if start != end:
+                key, value_start = self._load_key(start)
+                yield (key, pickle.loads(self._mm[value_start: end]))
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))}, {self._max_hash})'
+
+    def __contains__(self, key: Any) -> bool:
+        return self._find_record(key) is not None
+
+    def __getitem__(self, key: Any) -> Any:
+        record = self._find_record(key)
+        if record is not None:
+            return pickle.loads(self._mm[record[0]: record[1]])
+        else:
+            raise KeyError
@@ -0,0 +1,100 @@
+import reprlib
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from idealhash import HashMap, BuildStats
+from typing import *
+
+
+Source = Union[str, Callable[[], Iterable[Tuple[Any, Any]]], Collection[Tuple[Any, Any]]]
+
+
+def build_map(source: Source, kwargs: Dict[str, Any]) -> Tuple[HashMap, float]:
+    """
+    Builds HashMap from a file or a function (streaming) or from a collection of pairs.
+    Returns the map and its build time
+    """
+    start = time.perf_counter()
+
+    if isinstance(source, str) or callable(source):
+        mapping = HashMap.from_source(source, **kwargs)
+    else:
+        mapping = HashMap(source, **kwargs)
+
+    return (mapping, time.perf_counter() - start)
+
+
+class HotSwapMap:
+    def __init__(self, mapping: HashMap, processes: bool = False) -> None:
+        """
+        Serves lookups from current map while replacement is built on a worker thread
+        (or process, then source must be picklable, e.g. file name), and swaps them when it is ready.
+        Map, its generation and build time are replaced as one tuple, so the swap is atomic
+        and readers which already took the old map finish on it
+        """
+        self._current = (mapping, 0, 0.0)
+        self._executor: Executor = ProcessPoolExecutor(1) if processes else ThreadPoolExecutor(1)
+
+    def __enter__(self) -> 'HotSwapMap':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def rebuild(self, source: Source, **kwargs) -> Future:
+        """
+        Starts building new map with HashMap arguments kwargs, rebuilds run one after another.
+        Returned future is done after the swap and holds the new generation.
+        If build fails, old map is kept and the exception is set on returned future
+        """
+        swapped = Future()
+        self._executor.submit(build_map, source, kwargs).add_done_callback(lambda built: self._swap(built, swapped))
+        return swapped
+
+    def _swap(self, built: Future, swapped: Future) -> None:
+        if built.exception() is not None:
+            swapped.set_exception(built.exception())
+            return
+
+        mapping, build_time = built.result()
+        self._current = (mapping, self._current[1] + 1, build_time)
+        swapped.set_result(self._current[1])
+
+    @property
+    def mapping(self) -> HashMap:
+        return self._current[0]
+
+    @property
+    def generation(self) -> int:
+        return self._current[1]
+
+    @property
+    def build_time(self) -> float:
+        return self._current[2]
+
+    @property
+    def stats(self) -> Optional[BuildStats]:
+        return self._current[0].stats
+
+    def get_many(self, keys: Sequence[Any], default: Any = None) -> List[Any]:
+        return self._current[0].get_many(keys, default)
+
+    def contains_many(self, keys: Sequence[Any]) -> List[bool]:
+        return self._current[0].contains_many(keys)
+
+    def __len__(self) -> int:
+        return len(self._current[0])
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        return iter(self._current[0])
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))}, generation={self.generation})'
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._current[0]
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._current[0][key]
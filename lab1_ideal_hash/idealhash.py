@@ -1,115 +1,443 @@
+import json
 import random
 import reprlib
-from utils import find_greater_prime, to_vector
+import itertools
+import collections
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from utils import find_greater_prime, to_vector, poly_hash, PowerTable, deserialize_objects
+from bloomfilter import BloomFilter
 from typing import *
 
 
-def random_hash_func(prime: int, max_hash: int) -> Callable[[Any], int]:
-    a, b = random.randrange(1, prime), random.randrange(0, prime)
+SPACE_FACTOR = 2
+MAX_ATTEMPTS = 100
+
+
+class _Empty:
+    """
+    Marker of empty slot, pickled by reference, so maps built in another process keep recognizing empty slots
+    """
+    def __reduce__(self) -> str:
+        return '_EMPTY'
+
+    def __repr__(self) -> str:
+        return '_EMPTY'
+
+
+_EMPTY = _Empty()
+
+
+def random_hash_params(prime: int) -> Tuple[int, int]:
+    return (random.randrange(1, prime), random.randrange(0, prime))
+
+
+def make_hash_func(a: int, b: int, prime: int, max_hash: int) -> Callable[[Any], int]:
+    powers = PowerTable(a, prime)
 
     def hash_func(obj: Any) -> int:
-        vector = to_vector(obj)
-        return ((sum((a ** i) * val for i, val in enumerate(vector, start=1)) + b) % prime) % max_hash
+        return ((powers.poly_hash(to_vector(obj)) + b) % prime) % max_hash
 
     return hash_func
 
 
-class BasicHashMap:
-    def __init__(self, elements: List[Tuple[Any, Any]], prime: int):
-        self._set_up(elements, prime, len(elements) ** 2)
+def random_hash_func(prime: int, max_hash: int) -> Callable[[Any], int]:
+    a, b = random_hash_params(prime)
+    return make_hash_func(a, b, prime, max_hash)
+
 
-    def _set_up(self, elements: List[Tuple[Any, Any]], prime: int, max_hash: int) -> None:
-        self._arr = [None for _ in range(max_hash)]
-        self._hash_func = random_hash_func(prime, max_hash)
+def solve_bucket(vectors: Sequence[Sequence[int]], prime: int,
+                 max_attempts: int = MAX_ATTEMPTS, size: int = 0) -> Tuple[int, int, int, List[int]]:
+    """
+    Finds second level hash function which maps vectors to size slots (len(vectors) ** 2 by default)
+    without collisions. Returns its parameters a, b, number of attempts it took and slot of each vector
+    """
+    if size <= 0:
+        size = len(vectors) ** 2
 
-        for key, value in elements:
-            hash_val = self._hash_func(key)
-            if self._arr[hash_val] is None:
-                # noinspection PyTypeChecker
-                self._arr[hash_val] = (key, value)
-            else:
-                self._set_up(elements, prime, max_hash)
-                return
+    for attempt in range(1, max_attempts + 1):
+        a, b = random_hash_params(prime)
+        slots = [((poly_hash(vector, a, prime) + b) % prime) % size for vector in vectors]
 
-    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
-        for item in self._arr:
-            if item is not None:
-                yield item
+        if len(set(slots)) == len(slots):
+            return (a, b, attempt, slots)
 
-    def __contains__(self, key: Any) -> bool:
-        hash_val = self._hash_func(key)
-        return self._arr[hash_val] is not None and self._arr[hash_val][0] == key
+    raise RuntimeError(f'Could not find collision-free hash function in {max_attempts} attempts')
 
-    def __getitem__(self, key: Any) -> Any:
-        hash_val = self._hash_func(key)
-        if self._arr[hash_val] is not None and self._arr[hash_val][0] == key:
-            return self._arr[hash_val][1]
-        else:
-            raise KeyError
+
+def solve_buckets(buckets: List[List[Sequence[int]]], prime: int,
+                  max_attempts: int = MAX_ATTEMPTS) -> List[Tuple[int, int, int, array]]:
+    """
+    Runs solve_bucket for every bucket of the chunk, packing slots into arrays to keep results small
+    """
+    return [(a, b, attempts, array('Q', slots))
+            for a, b, attempts, slots in (solve_bucket(vectors, prime, max_attempts) for vectors in buckets)]
+
+
+def split_chunks(buckets: List[List[Sequence[int]]], chunk_count: int) -> List[List[List[Sequence[int]]]]:
+    """
+    Splits consecutive buckets into chunks with roughly the same number of keys
+    """
+    chunk_len = sum(len(bucket) for bucket in buckets) / chunk_count
+    chunks, cur_chunk, cur_len = [], [], 0
+
+    for bucket in buckets:
+        cur_chunk.append(bucket)
+        cur_len += len(bucket)
+
+        if cur_len >= chunk_len:
+            chunks.append(cur_chunk)
+            cur_chunk, cur_len = [], 0
+
+    if len(cur_chunk) > 0:
+        chunks.append(cur_chunk)
+
+    return chunks
+
+
+class BuildStats:
+    def __init__(self) -> None:
+        self.length = 0
+        self.first_level_attempts = 0
+        self.bucket_sizes = {}
+        self.squared_sizes = 0
+        self.second_level_attempts = {}
+        self.hashing_time = 0.0
+        self.allocation_time = 0.0
+        self.slots_per_key = 0.0
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(self.to_dict())})'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def dump(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
 
 
 class HashMap:
-    def __init__(self, elements: Collection[Tuple[Any, Any]], max_hash: int = 0):
+    def __init__(self, elements: Collection[Tuple[Any, Any]], max_hash: int = 0,
+                 space_factor: float = SPACE_FACTOR, max_attempts: int = MAX_ATTEMPTS, workers: int = 0,
+                 collect_stats: bool = False, fp_rate: Optional[float] = None):
+        """
+        Retries first level hash function until sum of squared bucket sizes
+        is at most space_factor * (n + n * (n - 1) / max_hash), which is 4n for max_hash = n.
+        Each level gives up after max_attempts hash functions with RuntimeError.
+        With workers > 1 second level functions are searched in a pool of that many processes.
+        With collect_stats build statistics are available as stats property.
+        With fp_rate lookups first check Bloom filter of keys with such false positive rate (bloom_filter property)
+
+        Entries of all buckets are kept in flat _keys/_values lists: bucket i owns slots
+        _offsets[i] ... _offsets[i] + size - 1, where (a, b, size) = _params[3 * i: 3 * i + 3]
+        """
         if max_hash <= 0:
-            max_hash = len(elements)
+            max_hash = max(len(elements), 1)
+
+        self._prime = find_greater_prime(len(elements) ** 2)
+        self._max_hash = max_hash
+        self._stats = BuildStats() if collect_stats else None
+        space_bound = space_factor * (len(elements) + len(elements) * (len(elements) - 1) / max_hash)
+        start = time.perf_counter()
+
+        for attempt in range(1, max_attempts + 1):
+            self._a, self._b = random_hash_params(self._prime)
+            self._powers = PowerTable(self._a, self._prime)
+            buckets = self._split(elements)
+            squared_sizes = sum(len(bucket) ** 2 for bucket in buckets if bucket is not None)
+
+            if squared_sizes <= space_bound:
+                break
+        else:
+            raise RuntimeError(f'Could not find first level hash function in {max_attempts} attempts')
+
+        self._first_level_attempts = attempt
+        hashing_time = time.perf_counter() - start
+        self._length = self._fill_map(buckets, max_attempts, workers)
+        self._record_stats((0 if bucket is None else len(bucket) for bucket in buckets), squared_sizes, hashing_time)
+        self._attach_filter(fp_rate)
+
+    @classmethod
+    def from_source(cls, source: Union[str, Callable[[], Iterable[Tuple[Any, Any]]]], length: int = 0,
+                    max_hash: int = 0, space_factor: float = SPACE_FACTOR, max_attempts: int = MAX_ATTEMPTS,
+                    collect_stats: bool = False, fp_rate: Optional[float] = None) -> 'HashMap':
+        """
+        Builds map without materializing source, which is either a file written by serialize_objects
+        or a function returning new iterator over (key, value) pairs on every call.
+        First pass counts bucket sizes from key hashes alone (and is repeated if first level function is rejected),
+        second pass streams entries straight into regions of their buckets in the final table.
+        Unless length is given, source is counted with one more pass
+        """
+        if isinstance(source, str):
+            filename = source
+            source = lambda: deserialize_objects(filename)
+
+        if length <= 0:
+            length = sum(1 for _ in source())
+
+        mapping = cls.__new__(cls)
+        mapping._prime = find_greater_prime(length ** 2)
+        mapping._max_hash = max_hash if max_hash > 0 else max(length, 1)
+        mapping._stats = BuildStats() if collect_stats else None
+        mapping._stream_fill(source, length, space_factor, max_attempts)
+        mapping._attach_filter(fp_rate)
+
+        return mapping
+
+    def _attach_filter(self, fp_rate: Optional[float]) -> None:
+        self._filter = None if fp_rate is None else BloomFilter(self._length, fp_rate)
+
+        if self._filter is not None:
+            for _, key, _ in self._iter_slots():
+                self._filter.add_vector(to_vector(key))
+
+    def _record_stats(self, bucket_sizes: Iterable[int], squared_sizes: int, hashing_time: float) -> None:
+        if self._stats is None:
+            return
 
-        prime = find_greater_prime(len(elements) ** 2)
+        self._stats.length = self._length
+        self._stats.first_level_attempts = self._first_level_attempts
+        self._stats.bucket_sizes = dict(sorted(collections.Counter(bucket_sizes).items()))
+        self._stats.squared_sizes = squared_sizes
+        self._stats.second_level_attempts = self.second_level_attempts
+        self._stats.hashing_time += hashing_time
+        self._stats.slots_per_key = len(self._keys) / max(self._length, 1)
 
-        self._hash_func = random_hash_func(prime, max_hash)
-        self._length = self._fill_map(elements, prime, max_hash)
+    def _bucket(self, vector: Sequence[int]) -> int:
+        return ((self._powers.poly_hash(vector) + self._b) % self._prime) % self._max_hash
 
-    def _fill_map(self, elements: Collection[Tuple[Any, Any]], prime: int, max_hash: int) -> int:
-        self._arr = [None for _ in range(max_hash)]
-        tmp_arr = [None for _ in range(max_hash)]
+    def _split(self, elements: Collection[Tuple[Any, Any]]) -> List[Optional[List[Tuple[Any, Any, Sequence[int]]]]]:
+        tmp_arr = [None for _ in range(self._max_hash)]
 
         for key, value in elements:
-            hash_val = self._hash_func(key)
+            vector = to_vector(key)
+            hash_val = self._bucket(vector)
             if tmp_arr[hash_val] is None:
                 # noinspection PyTypeChecker
-                tmp_arr[hash_val] = [(key, value)]
+                tmp_arr[hash_val] = [(key, value, vector)]
             else:
                 insert = True
                 # noinspection PyTypeChecker
                 for i in range(len(tmp_arr[hash_val])):
                     tmp_key = tmp_arr[hash_val][i][0]
                     if key == tmp_key:
-                        tmp_arr[hash_val][i] = (key, value)
+                        tmp_arr[hash_val][i] = (key, value, vector)
                         insert = False
 
                 if insert:
-                    tmp_arr[hash_val].append((key, value))
+                    tmp_arr[hash_val].append((key, value, vector))
 
+        return tmp_arr
+
+    def _solve(self, buckets: List[List[Sequence[int]]], max_attempts: int,
+               workers: int) -> Iterator[Tuple[int, int, int, Sequence[int]]]:
+        if workers <= 1:
+            for vectors in buckets:
+                yield solve_bucket(vectors, self._prime, max_attempts)
+            return
+
+        # memoryview vectors of str and bytes keys can't be pickled
+        buckets = [[array('I', vector) if isinstance(vector, memoryview) else vector for vector in vectors]
+                   for vectors in buckets]
+        chunks = split_chunks(buckets, workers * 4)
+        with ProcessPoolExecutor(workers, initializer=random.seed) as executor:
+            for solutions in executor.map(solve_buckets, chunks, itertools.repeat(self._prime),
+                                          itertools.repeat(max_attempts)):
+                yield from solutions
+
+    def _count_buckets(self, source: Callable[[], Iterable[Tuple[Any, Any]]], space_bound: float,
+                       max_attempts: int) -> array:
+        for attempt in range(1, max_attempts + 1):
+            self._a, self._b = random_hash_params(self._prime)
+            self._powers = PowerTable(self._a, self._prime)
+            counts = array('Q', bytes(8 * self._max_hash))
+
+            for key, _ in source():
+                counts[self._bucket(to_vector(key))] += 1
+
+            if sum(count ** 2 for count in counts) <= space_bound:
+                break
+        else:
+            raise RuntimeError(f'Could not find first level hash function in {max_attempts} attempts')
+
+        self._first_level_attempts = attempt
+        return counts
+
+    def _stream_fill(self, source: Callable[[], Iterable[Tuple[Any, Any]]], length: int, space_factor: float,
+                     max_attempts: int) -> None:
+        """
+        Bucket i gets region of counts[i] ** 2 slots, its entries are appended to the start of the region
+        (replacing equal keys), then the bucket is solved and its entries are permuted within the region
+        """
+        max_hash = self._max_hash
+        space_bound = space_factor * (length + length * (length - 1) / max_hash)
+        start = time.perf_counter()
+        counts = self._count_buckets(source, space_bound, max_attempts)
+        hashing_time = time.perf_counter() - start
+
+        self._params = array('Q', bytes(3 * 8 * max_hash))
+        self._offsets = array('Q', bytes(8 * max_hash))
+        self._attempts = array('I', bytes(4 * max_hash))
+
+        total_size = 0
+        for i, count in enumerate(counts):
+            self._offsets[i] = total_size
+            total_size += count ** 2
+
+        self._keys = [_EMPTY] * total_size
+        self._values = [None] * total_size
+        filled = array('Q', bytes(8 * max_hash))
+
+        for key, value in source():
+            i = self._bucket(to_vector(key))
+            offset, count = self._offsets[i], filled[i]
+
+            for slot in range(offset, offset + count):
+                if self._keys[slot] == key:
+                    self._values[slot] = value
+                    break
+            else:
+                self._keys[offset + count], self._values[offset + count] = key, value
+                filled[i] += 1
+
+        for i, count in enumerate(filled):
+            if count == 0:
+                continue
+
+            offset, size = self._offsets[i], counts[i] ** 2
+            keys, values = self._keys[offset: offset + count], self._values[offset: offset + count]
+
+            solve_start = time.perf_counter()
+            a, b, attempts, slots = solve_bucket([to_vector(key) for key in keys], self._prime, max_attempts, size)
+            hashing_time += time.perf_counter() - solve_start
+
+            self._keys[offset: offset + count] = [_EMPTY] * count
+            self._values[offset: offset + count] = [None] * count
+            for key, value, slot in zip(keys, values, slots):
+                self._keys[offset + slot], self._values[offset + slot] = key, value
+
+            self._params[3 * i: 3 * i + 3] = array('Q', [a, b, size])
+            self._attempts[i] = attempts
+
+        self._length = sum(filled)
+        if self._stats is not None:
+            self._stats.allocation_time += time.perf_counter() - start - hashing_time
+        self._record_stats(filled, total_size, hashing_time)
+
+    def _fill_map(self, buckets: List[Optional[List[Tuple[Any, Any, Sequence[int]]]]], max_attempts: int,
+                  workers: int) -> int:
+        start = time.perf_counter()
+        self._params = array('Q', bytes(3 * 8 * len(buckets)))
+        self._offsets = array('Q', bytes(8 * len(buckets)))
+        self._attempts = array('I', bytes(4 * len(buckets)))
+
+        total_size = 0
+        for i, bucket in enumerate(buckets):
+            if bucket is not None:
+                self._offsets[i] = total_size
+                total_size += len(bucket) ** 2
+
+        self._keys = [_EMPTY] * total_size
+        self._values = [None] * total_size
         len_count = 0
 
-        for i, keys in enumerate(tmp_arr):
-            if keys is not None:
-                # noinspection PyTypeChecker
-                self._arr[i] = BasicHashMap(keys, prime)
-                # noinspection PyTypeChecker
-                len_count += len(keys)
+        filled = [i for i, bucket in enumerate(buckets) if bucket is not None]
+        solutions = self._solve([[vector for _, _, vector in buckets[i]] for i in filled], max_attempts, workers)
+        hashing_time = 0.0
+
+        for i in filled:
+            solve_start = time.perf_counter()
+            a, b, attempts, slots = next(solutions)
+            hashing_time += time.perf_counter() - solve_start
+
+            bucket, offset = buckets[i], self._offsets[i]
+            self._params[3 * i: 3 * i + 3] = array('Q', [a, b, len(bucket) ** 2])
+            self._attempts[i] = attempts
+
+            for (key, value, _), slot in zip(bucket, slots):
+                self._keys[offset + slot] = key
+                self._values[offset + slot] = value
+
+            len_count += len(bucket)
+
+        if self._stats is not None:
+            self._stats.hashing_time += hashing_time
+            self._stats.allocation_time += time.perf_counter() - start - hashing_time
 
         return len_count
 
+    def _find_slot(self, key: Any) -> int:
+        vector = to_vector(key)
+        if self._filter is not None and not self._filter.contains_vector(vector):
+            return -1
+
+        bucket = self._bucket(vector)
+        size = self._params[3 * bucket + 2]
+
+        if size == 0:
+            return -1
+
+        a, b = self._params[3 * bucket], self._params[3 * bucket + 1]
+        slot = self._offsets[bucket] + ((poly_hash(vector, a, self._prime) + b) % self._prime) % size
+        slot_key = self._keys[slot]
+
+        return slot if slot_key is not _EMPTY and slot_key == key else -1
+
+    def _find_slots(self, keys: Sequence[Any]) -> List[int]:
+        # numpy is needed only for batch lookups
+        from batchhash import find_slots
+
+        vectors = [to_vector(key) for key in keys]
+        slots = find_slots(vectors, self._a, self._b, self._prime, self._max_hash, self._params, self._offsets)
+
+        return [slot if slot != -1 and (slot_key := self._keys[slot]) is not _EMPTY and slot_key == key else -1
+                for key, slot in zip(keys, slots.tolist())]
+
+    def get_many(self, keys: Sequence[Any], default: Any = None) -> List[Any]:
+        return [self._values[slot] if slot != -1 else default for slot in self._find_slots(keys)]
+
+    def contains_many(self, keys: Sequence[Any]) -> List[bool]:
+        return [slot != -1 for slot in self._find_slots(keys)]
+
+    @property
+    def bloom_filter(self) -> Optional[BloomFilter]:
+        return self._filter
+
+    @property
+    def stats(self) -> Optional[BuildStats]:
+        return self._stats
+
+    @property
+    def first_level_attempts(self) -> int:
+        return self._first_level_attempts
+
+    @property
+    def second_level_attempts(self) -> Dict[int, int]:
+        return {i: attempts for i, attempts in enumerate(self._attempts) if attempts > 0}
+
     def __len__(self) -> int:
         return self._length
 
     def __iter__(self) -> Iterator[Tuple[Any, Any]]:
-        for item in self._arr:
-            if item is not None:
-                # noinspection PyTypeChecker
-                for el in item:
-                    yield el
+        for _, key, value in self._iter_slots():
+            yield (key, value)
+
+    def _iter_slots(self) -> Iterator[Tuple[int, Any, Any]]:
+        for slot, (key, value) in enumerate(zip(self._keys, self._values)):
+            if key is not _EMPTY:
+                yield (slot, key, value)
 
     def __repr__(self) -> str:
-        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))}, {len(self._arr)})'
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))}, {self._max_hash})'
 
     def __contains__(self, key: Any) -> bool:
-        hash_val = self._hash_func(key)
-        return self._arr[hash_val] is not None and key in self._arr[hash_val]
+        return self._find_slot(key) != -1
 
     def __getitem__(self, key: Any) -> Any:
-        hash_val = self._hash_func(key)
-        if self._arr[hash_val] is not None:
-            return self._arr[hash_val][key]
+        slot = self._find_slot(key)
+        if slot != -1:
+            return self._values[slot]
         else:
             raise KeyError
@@ -1,6 +1,8 @@
+import os
 from idealhash import HashMap
+from frozenhash import FrozenHashMap, freeze
 from utils.staff import Division, Worker
-from utils import serialize_objects, deserialize_objects
+from utils import serialize_objects
 
 
 divisions = [
@@ -18,8 +20,15 @@ divisions = [
 ]
 
 
+SOURCE_FILE = 'divisions.bin'
+FROZEN_FILE = 'divisions.fks'
+
+
 if __name__ == '__main__':
-    mapping = HashMap(list(deserialize_objects('divisions.bin')))
+    if not os.path.exists(FROZEN_FILE) or os.path.getmtime(FROZEN_FILE) < os.path.getmtime(SOURCE_FILE):
+        freeze(HashMap.from_source(SOURCE_FILE), FROZEN_FILE)
+
+    mapping = FrozenHashMap(FROZEN_FILE)
     print(mapping)
     print(mapping[Division('The Witcher')])
 
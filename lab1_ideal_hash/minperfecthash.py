@@ -0,0 +1,172 @@
+import random
+import reprlib
+from array import array
+from utils import find_greater_prime, to_vector, PowerTable
+from idealhash import MAX_ATTEMPTS, random_hash_params
+from typing import *
+
+
+BUCKET_SIZE = 4
+DISPLACEMENT_ROUNDS = 256
+
+
+def smallest_typecode(max_value: int) -> str:
+    for typecode in 'BHIQ':
+        if max_value < 2 ** (8 * array(typecode).itemsize):
+            return typecode
+
+    raise OverflowError(f'{max_value} does not fit in 64 bits')
+
+
+class MinimalHashMap:
+    def __init__(self, elements: Collection[Tuple[Any, Any]], bucket_size: int = BUCKET_SIZE,
+                 max_attempts: int = MAX_ATTEMPTS) -> None:
+        """
+        Minimal perfect hashing with CHD (compress, hash, displace) scheme: n keys take exactly n slots.
+        Keys are split into about n / bucket_size buckets, and every bucket keeps one displacement
+        i = d0 * n + d1, which puts key with hashes f1, f2 into slot (f1 + d0 * f2 + d1) % n.
+        Buckets are placed from largest to smallest, single key buckets are pointed directly at free slots
+        """
+        self._prime = find_greater_prime(max(len(elements), 2) ** 2)
+
+        for attempt in range(1, max_attempts + 1):
+            self._set_hash_funcs()
+            buckets = self._split(elements, bucket_size)
+            self._length = sum(len(bucket) for bucket in buckets)
+
+            if self._place(buckets):
+                break
+        else:
+            raise RuntimeError(f'Could not find displacements in {max_attempts} attempts')
+
+        self._attempts = attempt
+
+    def _set_hash_funcs(self) -> None:
+        self._params = [random_hash_params(self._prime) for _ in range(3)]
+        self._powers = [PowerTable(a, self._prime) for a, _ in self._params]
+
+    def _hashes(self, vector: Sequence[int]) -> Tuple[int, int, int]:
+        """
+        Returns raw bucket, f1 and f2 hashes of vector
+        """
+        return tuple((powers.poly_hash(vector) + b) % self._prime for powers, (_, b) in zip(self._powers, self._params))
+
+    def _split(self, elements: Collection[Tuple[Any, Any]], bucket_size: int) -> List[List[Tuple[Any, Any, int, int]]]:
+        buckets = [[] for _ in range(max(1, -(-len(elements) // bucket_size)))]
+
+        for key, value in elements:
+            bucket_hash, f1, f2 = self._hashes(to_vector(key))
+            bucket = buckets[bucket_hash % len(buckets)]
+
+            for i, (tmp_key, *_) in enumerate(bucket):
+                if key == tmp_key:
+                    bucket[i] = (key, value, f1, f2)
+                    break
+            else:
+                bucket.append((key, value, f1, f2))
+
+        return buckets
+
+    def _slot(self, displacement: int, f1: int, f2: int) -> int:
+        d0, d1 = divmod(displacement, self._length)
+        return (f1 + d0 * f2 + d1) % self._length
+
+    def _place(self, buckets: List[List[Tuple[Any, Any, int, int]]]) -> bool:
+        length = self._length
+        self._keys = [None for _ in range(length)]
+        self._values = [None for _ in range(length)]
+        displacements = [0 for _ in range(len(buckets))]
+
+        # free slots in random order with their positions, so taking one is O(1) and scans are not biased
+        free = list(range(length))
+        random.shuffle(free)
+        positions = [0 for _ in range(length)]
+        for i, slot in enumerate(free):
+            positions[slot] = i
+        taken = bytearray(length)
+
+        for i in sorted(range(len(buckets)), key=lambda i: len(buckets[i]), reverse=True):
+            bucket = buckets[i]
+
+            if len(bucket) == 0:
+                break
+
+            found = self._displace(bucket, free, taken)
+            if found is None:
+                return False
+
+            displacements[i], slots = found
+            for (key, value, _, _), slot in zip(bucket, slots):
+                self._keys[slot], self._values[slot] = key, value
+                taken[slot] = 1
+
+                last = free.pop()
+                if last != slot:
+                    free[positions[slot]] = last
+                    positions[last] = positions[slot]
+
+        self._displacements = array(smallest_typecode(max(displacements)), displacements)
+        return True
+
+    def _displace(self, bucket: List[Tuple[Any, Any, int, int]], free: List[int],
+                  taken: bytearray) -> Optional[Tuple[int, List[int]]]:
+        """
+        For every d0 tries to put first key of bucket into each free slot, which fixes d1.
+        Returns displacement and slots of bucket keys
+        """
+        length = self._length
+
+        for d0 in range(min(length, DISPLACEMENT_ROUNDS)):
+            starts = [(f1 + d0 * f2) % length for *_, f1, f2 in bucket]
+            shifts = [(start - starts[0]) % length for start in starts[1:]]
+
+            if len(set(shifts)) != len(shifts) or 0 in shifts:
+                continue
+
+            first = random.randrange(len(free))
+            for j in range(len(free)):
+                slot = free[first + j - len(free)]
+
+                if not any(taken[(slot + shift) % length] for shift in shifts):
+                    d1 = (slot - starts[0]) % length
+                    return (d0 * length + d1, [slot] + [(slot + shift) % length for shift in shifts])
+
+        return None
+
+    def _find_slot(self, key: Any) -> int:
+        if self._length == 0:
+            return -1
+
+        bucket_hash, f1, f2 = self._hashes(to_vector(key))
+        slot = self._slot(self._displacements[bucket_hash % len(self._displacements)], f1, f2)
+
+        return slot if self._keys[slot] == key else -1
+
+    def get_many(self, keys: Sequence[Any], default: Any = None) -> List[Any]:
+        return [self._values[slot] if slot != -1 else default for slot in map(self._find_slot, keys)]
+
+    def contains_many(self, keys: Sequence[Any]) -> List[bool]:
+        return [slot != -1 for slot in map(self._find_slot, keys)]
+
+    @property
+    def attempts(self) -> int:
+        return self._attempts
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        return zip(self._keys, self._values)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({reprlib.repr(list(iter(self)))})'
+
+    def __contains__(self, key: Any) -> bool:
+        return self._find_slot(key) != -1
+
+    def __getitem__(self, key: Any) -> Any:
+        slot = self._find_slot(key)
+        if slot != -1:
+            return self._values[slot]
+        else:
+            raise KeyError
@@ -1,14 +1,14 @@
 from orderstattree import OrderStatTree
 from utils.students import Stream, Student
-from utils import STREAMS, fetch_stream_students
+from utils import fetch_grouped_students
 from typing import Iterator
 
 
 if __name__ == '__main__':
     specialty_tree = OrderStatTree()
 
-    for stream in STREAMS:
-        for student in fetch_stream_students(stream):
+    for stream, students in fetch_grouped_students():
+        for student in students:
             specialty_tree.insert(stream, student)
 
     stream = specialty_tree.get(Stream('Інженерія програмного забезпечення', 2))
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import *
 import reprlib
 import collections
+from utils.treemixin import build_balanced
 
 
 TKey, TValue = TypeVar('TKey'), TypeVar('TValue')
@@ -121,6 +122,23 @@ class OrderStatTree(Generic[TKey, TValue]):
     def __len__(self) -> int:
         return tree_size_of(self._root)
 
+    def bulk_load(self, runs: Sequence[Tuple[TKey, List[TValue]]]) -> None:
+        """
+        Builds tree from (key, values) runs with distinct keys in ascending order without comparing keys.
+        Median split fills all levels except the last, so nodes of the last level are red and others are black
+        """
+        if self._root is not None:
+            raise ValueError('bulk_load expects empty tree')
+
+        last_level = len(runs).bit_length() - 1
+
+        def make_node(key: TKey, values: List[TValue], lt: Optional[SizedNode], rt: Optional[SizedNode],
+                      depth: int) -> SizedNode:
+            color = Color.RED if depth == last_level > 0 else Color.BLACK
+            return SizedNode(key, values, len(values) + tree_size_of(lt) + tree_size_of(rt), color, lt, rt)
+
+        self._root = build_balanced(runs, make_node)
+
     def _node_iter(self) -> Iterator[SizedNode]:
         node_stack = collections.deque()
         tmp = self._root
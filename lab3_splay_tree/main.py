@@ -1,13 +1,13 @@
 from splaytree import SplayTree
 from utils.students import Stream, Student
-from utils import fetch_stream_students
+from utils.columnar import StudentColumns
 
 
 if __name__ == '__main__':
     stream_key = Stream('Інженерія програмного забезпечення', 2)
 
-    students = fetch_stream_students(stream_key)
-    student_tree = SplayTree([(student, None) for student in students])
+    student_tree = SplayTree()
+    student_tree.bulk_load(StudentColumns.fetch_stream(stream_key).student_runs())
 
     excellent_key = Student('Я', 'Я', 'Я', 90)
 
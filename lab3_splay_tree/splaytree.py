@@ -1,7 +1,8 @@
 from __future__ import annotations
 from typing import *
 import copy
-from utils.treemixin import ParentedNode, TKey, TValue, BalancingTreeMixin, max_node, min_node, assign_son
+from utils.treemixin import ParentedNode, TKey, TValue, BalancingTreeMixin, max_node, min_node, assign_son, \
+    build_balanced
 
 
 def tree_size(node: Optional[ParentedNode]) -> int:
@@ -19,6 +20,17 @@ class SplayTree(BalancingTreeMixin[TKey, TValue]):
     def __len__(self) -> int:
         return self._length
 
+    def bulk_load(self, runs: Sequence[Tuple[TKey, List[TValue]]]) -> None:
+        """
+        Builds balanced tree from (key, values) runs with distinct keys in ascending order
+        without comparing keys, e.g. StudentColumns.student_runs
+        """
+        if self._root is not None:
+            raise ValueError('bulk_load expects empty tree')
+
+        self._root = build_balanced(runs, lambda key, values, lt, rt, _: ParentedNode(key, values, lt, rt))
+        self._length = sum(len(values) for _, values in runs)
+
     def __contains__(self, key: TKey) -> bool:
         node = self._search_node(key)
 
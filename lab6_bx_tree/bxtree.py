@@ -1,15 +1,44 @@
 import reprlib
 from bxnode import *
+from bloomfilter import BloomFilter
+from utils import to_vector
+
+
+# key types whose to_vector encoding is the same for all equal keys, e.g. int keys are never equal to str ones,
+# but 1 == 1.0 == True are encoded differently
+CANONICAL_KEY_TYPES = (str, bytes, int)
+
+
+def even_chunks(count: int, max_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits range(count) into the fewest chunks of at most max_size, with sizes differing at most by one
+    """
+    chunk_count = -(-count // max_size)
+    bounds = [count * i // chunk_count for i in range(chunk_count + 1)]
+
+    return list(zip(bounds, bounds[1:]))
 
 
 class BxTree(Generic[TKey, TValue]):
-    def __init__(self, b_order: int, init_list: Optional[Iterable[Tuple[TKey, TValue]]] = None) -> None:
+    def __init__(self, b_order: int, init_list: Optional[Iterable[Tuple[TKey, TValue]]] = None,
+                 fp_rate: Optional[float] = None,
+                 key_vector: Optional[Callable[[TKey], Sequence[int]]] = None) -> None:
+        """
+        With fp_rate lookups of absent keys are mostly answered by Bloom filter with such false positive rate.
+        Filter hashes key_vector(key), which must be the same for all equal keys. Without key_vector
+        keys must be of CANONICAL_KEY_TYPES, and lookups by keys of other types skip the filter.
+        Removed keys stay in the filter, it is rebuilt from the tree when the number of added keys
+        exceeds its capacity
+        """
         if b_order < 3:
             raise ValueError('b_order should be >= 3')
 
         self._root = None
         self._b_order = b_order
         self._length = 0
+        self._fp_rate = fp_rate
+        self._filter = None if fp_rate is None else BloomFilter(0, fp_rate)
+        self._key_vector = key_vector
 
         if init_list is not None:
             for key, value in init_list:
@@ -32,6 +61,9 @@ class BxTree(Generic[TKey, TValue]):
                 tmp = tmp.next
 
     def __contains__(self, key: TKey) -> bool:
+        if self._filter_rejects(key):
+            return False
+
         node = self._search_leaf_node(key)
 
         if node is None:
@@ -50,11 +82,24 @@ class BxTree(Generic[TKey, TValue]):
     def b_order(self) -> int:
         return self._b_order
 
+    @property
+    def bloom_filter(self) -> Optional[BloomFilter]:
+        return self._filter
+
     def get(self, key: TKey) -> TValue:
+        if self._filter_rejects(key):
+            raise KeyError
+
         node = self._search_leaf_node(key)
+        if node is None:
+            raise KeyError
+
         return node.get(key)
 
     def insert(self, key: TKey, value: Optional[TValue] = None) -> None:
+        if self._filter is not None:
+            self._add_to_filter(self._checked_vector(key))
+
         tmp = self._search_leaf_node(key)
 
         if tmp is None:
@@ -91,6 +136,74 @@ class BxTree(Generic[TKey, TValue]):
                 merge(tmp)
                 tmp = tmp.parent
 
+    def bulk_load(self, items: Iterable[Tuple[TKey, TValue]]) -> None:
+        """
+        Builds tree bottom-up from items in ascending order of keys (the last value of equal keys is kept).
+        Keys are spread evenly over leaves of at most b_order - 1 keys, then children over inner nodes
+        of at most b_order children, so every node is filled at least by half
+        """
+        if self._root is not None:
+            raise ValueError('bulk_load expects empty tree')
+
+        keys, values = [], []
+        for key, value in items:
+            if self._filter is not None:
+                self._checked_vector(key)
+            if len(keys) > 0 and keys[-1] == key:
+                values[-1] = value
+            else:
+                keys.append(key)
+                values.append(value)
+
+        if len(keys) == 0:
+            return
+
+        nodes = [LeafNode(keys[start: end], values[start: end])
+                 for start, end in even_chunks(len(keys), self._b_order - 1)]
+        for leaf, next_leaf in zip(nodes, nodes[1:]):
+            leaf.next = next_leaf
+        min_keys = [leaf.keys[0] for leaf in nodes]
+
+        while len(nodes) > 1:
+            bounds = even_chunks(len(nodes), self._b_order)
+            nodes = [InnerNode(min_keys[start + 1: end], nodes[start: end]) for start, end in bounds]
+            min_keys = [min_keys[start] for start, _ in bounds]
+
+        self._root = nodes[0]
+        self._length = len(keys)
+
+        if self._filter is not None:
+            self._filter = BloomFilter(2 * self._length, self._fp_rate)
+            for key in keys:
+                self._filter.add_vector(self._filter_vector(key))
+
+    def _filter_vector(self, key: TKey) -> Optional[Sequence[int]]:
+        """
+        Returns vector of key for Bloom filter or None, if the filter can't answer for key
+        """
+        if self._key_vector is not None:
+            return self._key_vector(key)
+
+        return to_vector(key) if type(key) in CANONICAL_KEY_TYPES else None
+
+    def _checked_vector(self, key: TKey) -> Sequence[int]:
+        if (vector := self._filter_vector(key)) is None:
+            raise TypeError(f'key of type {type(key).__name__} needs key_vector to be added to Bloom filter')
+
+        return vector
+
+    def _filter_rejects(self, key: TKey) -> bool:
+        return (self._filter is not None and (vector := self._filter_vector(key)) is not None
+                and not self._filter.contains_vector(vector))
+
+    def _add_to_filter(self, vector: Sequence[int]) -> None:
+        if len(self._filter) >= self._filter.capacity:
+            self._filter = BloomFilter(2 * (self._length + 1), self._fp_rate)
+            for tree_key, _ in self:
+                self._filter.add_vector(self._filter_vector(tree_key))
+
+        self._filter.add_vector(vector)
+
     def _shrink_height(self) -> None:
         if isinstance(self._root, LeafNode):
             self._root = None
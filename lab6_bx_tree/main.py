@@ -1,6 +1,7 @@
 import random
 from bxtree import BxTree
-from utils.db.students_db import fetch_by_query
+from db.students_db import iter_by_query
+from utils.columnar import StudentColumns
 
 
 def demo():
@@ -30,14 +31,11 @@ def demo():
 
 if __name__ == '__main__':
     students = BxTree(10)
-
-    for student in fetch_by_query("SELECT * from students", {}):
-        name, surname, patronymic, avg, stream_id = student
-        students.insert(' '.join([surname, name, patronymic]), (avg, stream_id))
+    students.bulk_load(StudentColumns.fetch().fullname_items())
 
     streams = BxTree(3)
 
-    for stream in fetch_by_query("SELECT * from streams", {}):
+    for stream in iter_by_query("SELECT * from streams", {}):
         stream_id, specialty, course = stream
         streams.insert(stream_id, (specialty, course))
 
@@ -1,6 +1,10 @@
 import pytest
 import random
 import collections
+import students
+from utils import to_vector
+from utils.students import Student
+from lab6_bx_tree.bxtree import BxTree
 from lab6_bx_tree.bxtreetestversion import BxTreeTestVersion, height
 
 
@@ -32,3 +36,55 @@ def test_repeat_keys(bxtree: BxTreeTestVersion) -> None:
 def test_node_properties(bxtree: BxTreeTestVersion) -> None:
     for node in bxtree.iter_nodes():
         assert bxtree.is_valid(node)
+
+
+def test_bloom_filter() -> None:
+    keys = list(INPUT_VALUES)
+    bxtree = BxTree(random.randint(3, 100), [(key, -key) for key in keys[:5000]], fp_rate=0.01)
+
+    for key in keys[2500:5000]:
+        bxtree.remove(key)
+
+    for key in keys[5000:]:
+        assert key not in bxtree
+        with pytest.raises(KeyError):
+            bxtree.get(key)
+    for key in keys[:2500]:
+        assert key in bxtree and bxtree.get(key) == -key
+    for key in keys[2500:5000]:
+        assert key not in bxtree
+
+    assert bxtree.bloom_filter.misses >= 0.9 * 2 * len(keys[5000:])
+
+
+def test_bloom_filter_equal_keys() -> None:
+    bxtree = BxTree(3, [(1, 'a'), (3, 'b')], fp_rate=0.01)
+
+    assert 1.0 in bxtree and True in bxtree and bxtree.get(1.0) == 'a'
+    assert 2.0 not in bxtree and 2 not in bxtree
+    with pytest.raises(TypeError):
+        bxtree.insert(2.5, 'c')
+    assert len(bxtree) == 2
+
+    student = Student('Surname', 'Name', 'Patronymic', 90)
+    bxtree = BxTree(3, [(student, 1)], fp_rate=0.01, key_vector=lambda key: to_vector(key.fingerprint()))
+
+    assert Student('Surname', 'Name', 'Patronymic', 90) in bxtree
+    assert students.Student('Surname', 'Name', 'Patronymic', 90) in bxtree
+    assert Student('Surname', 'Name', 'Patronymic', 91) not in bxtree
+
+
+def test_bulk_load() -> None:
+    keys = sorted(INPUT_VALUES)
+    bxtree = BxTreeTestVersion()
+    bxtree.bulk_load((key, -key) for key in keys)
+
+    assert list(bxtree) == [(key, -key) for key in keys]
+    assert all(bxtree.is_valid(node) for node in bxtree.iter_nodes())
+    for inner_node in bxtree.iter_nodes(inner_only=True):
+        assert len({height(child) for child in inner_node.children}) == 1
+
+    for key in keys[::3]:
+        bxtree.remove(key)
+    assert all(bxtree.is_valid(node) for node in bxtree.iter_nodes())
+    assert len(bxtree) == len(keys) - len(keys[::3])
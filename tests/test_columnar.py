@@ -0,0 +1,38 @@
+from utils import STREAMS, fetch_stream_students
+from utils.columnar import StudentColumns
+from db.students_db import fetch_by_query
+from lab2_order_statistics.orderstattree import OrderStatTree
+from lab3_splay_tree.splaytree import SplayTree
+from lab6_bx_tree.bxtree import BxTree
+
+
+def test_student_runs():
+    columns = StudentColumns.fetch()
+    runs = columns.student_runs()
+    tree, expected = OrderStatTree(), OrderStatTree()
+    tree.bulk_load(runs)
+
+    for i in range(len(columns)):
+        expected.insert(columns.student(i), None)
+
+    assert len(columns) == len(tree) == 643
+    assert list(tree) == list(expected)
+    assert all(runs[i][0] < runs[i + 1][0] for i in range(len(runs) - 1))
+
+
+def test_stream_runs():
+    for stream in STREAMS[:6]:
+        tree = SplayTree()
+        tree.bulk_load(StudentColumns.fetch_stream(stream).student_runs())
+
+        assert [student for student, _ in tree] == sorted(fetch_stream_students(stream))
+
+
+def test_fullname_items():
+    tree, expected = BxTree(10), BxTree(10)
+    tree.bulk_load(StudentColumns.fetch().fullname_items())
+
+    for name, surname, patronymic, total, stream_id in fetch_by_query('SELECT * FROM students', {}):
+        expected.insert(' '.join([surname, name, patronymic]), (total, stream_id))
+
+    assert list(tree) == list(expected)
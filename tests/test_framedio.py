@@ -0,0 +1,61 @@
+import pytest
+import random
+from utils.staff import Division, Worker
+from utils import serialize_objects, deserialize_objects, deserialize_into, rand_str
+from utils.framedio import FramedReader, write_frames
+
+
+def gen_objects(count: int) -> list:
+    return [(Division(rand_str(random.randint(3, 12))), [Worker(rand_str(5)) for _ in range(random.randint(0, 5))])
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'bz2', 'lzma'])
+def test_framed(tmp_path, compression):
+    objects = gen_objects(3000)
+    filename = str(tmp_path / 'objects.bin')
+    serialize_objects(filename, objects, framed=True, compression=compression)
+
+    assert list(deserialize_objects(filename)) == objects
+
+    with FramedReader(filename) as reader:
+        assert len(reader) == len(objects)
+        for i in random.sample(range(len(objects)), 100):
+            assert reader[i] == objects[i]
+        assert reader[-1] == objects[-1]
+        assert reader[100: 2000: 7] == objects[100: 2000: 7]
+
+        with pytest.raises(IndexError):
+            _ = reader[len(objects)]
+
+
+def test_small_frames(tmp_path):
+    objects = gen_objects(500)
+    filename = str(tmp_path / 'objects.bin')
+    write_frames(filename, objects, 'zlib', frame_size=256)
+
+    with FramedReader(filename) as reader:
+        assert list(reader) == objects
+        assert [reader[i] for i in reversed(range(len(objects)))] == objects[::-1]
+
+
+def test_unframed(tmp_path):
+    objects = gen_objects(100)
+    filename = str(tmp_path / 'objects.bin')
+    serialize_objects(filename, objects)
+
+    assert list(deserialize_objects(filename)) == objects
+    with pytest.raises(ValueError):
+        FramedReader(filename)
+
+
+@pytest.mark.parametrize('framed', [False, True])
+def test_parallel(tmp_path, framed):
+    objects = gen_objects(3000)
+    filename = str(tmp_path / 'objects.bin')
+    serialize_objects(filename, objects, framed=framed)
+
+    assert list(deserialize_objects(filename, workers=2)) == objects
+    assert sorted(deserialize_objects(filename, workers=3, ordered=False),
+                  key=lambda item: item[0]) == list(enumerate(objects))
+    assert deserialize_into(filename, dict, workers=2) == dict(objects)
@@ -1,8 +1,16 @@
+import json
+import pickle
+import pytest
 import random
 from typing import Type
 from lab1_ideal_hash.idealhash import HashMap
+from lab1_ideal_hash.frozenhash import FrozenHashMap, freeze
+from lab1_ideal_hash.dynamichash import DynamicHashMap
+from lab1_ideal_hash.minperfecthash import MinimalHashMap
+from lab1_ideal_hash.hotswap import HotSwapMap
+from lab1_ideal_hash.cuckoohash import CuckooHashMap
 from utils.staff import Division, Worker
-from utils import gen_items, rand_str
+from utils import serialize_objects, gen_items, rand_str, to_vector, vector_cache, find_greater_prime, poly_hash, PowerTable
 
 
 def gen_div(item_type: Type[Division]) -> Division:
@@ -46,3 +54,288 @@ def test_length_non_unique():
 
     assert len(mapping) == length
 
+
+def test_empty():
+    mapping = HashMap([])
+
+    assert len(mapping) == 0 and list(mapping) == []
+    assert Division('a') not in mapping and mapping.get_many([Division('a')], 0) == [0]
+    with pytest.raises(KeyError):
+        mapping[Division('a')]
+
+
+def test_poly_hash():
+    prime = find_greater_prime(random.randint(10 ** 6, 10 ** 12))
+    a = random.randrange(1, prime)
+    powers = PowerTable(a, prime)
+
+    for _ in range(100):
+        vector = to_vector(rand_str(random.randint(1, 100)))
+        expected = sum((a ** i) * val for i, val in enumerate(vector, start=1)) % prime
+
+        assert poly_hash(vector, a, prime) == expected
+        assert powers.poly_hash(vector) == expected
+
+
+def test_space_bound():
+    length = 500
+    divisions = gen_items(length, Division, gen_div)
+    mapping = HashMap([(div, None) for div in divisions])
+
+    assert sum(mapping._params[2::3]) <= 4 * length
+    assert mapping.first_level_attempts >= 1
+    assert all(attempts >= 1 for attempts in mapping.second_level_attempts.values())
+
+
+def test_build_stats(tmp_path):
+    length = 500
+    divisions = gen_items(length, Division, gen_div)
+    mapping = HashMap([(div, None) for div in divisions], collect_stats=True)
+    stats = mapping.stats
+
+    assert HashMap([(div, None) for div in divisions]).stats is None
+    assert stats.length == length
+    assert sum(size * count for size, count in stats.bucket_sizes.items()) == length
+    assert stats.squared_sizes == len(mapping._keys) <= 4 * length
+    assert stats.slots_per_key == stats.squared_sizes / length
+    assert stats.second_level_attempts == mapping.second_level_attempts
+    assert stats.hashing_time > 0 and stats.allocation_time > 0
+
+    filename = tmp_path / 'stats.json'
+    stats.dump(str(filename))
+    assert json.loads(filename.read_text())['squared_sizes'] == stats.squared_sizes
+
+
+def test_from_source(tmp_path):
+    divisions = [(div, rand_str(5)) for div in gen_items(500, Division, gen_div)]
+    filename = str(tmp_path / 'divisions.bin')
+    serialize_objects(filename, divisions + divisions[:50])
+
+    for mapping in (HashMap.from_source(filename, collect_stats=True),
+                    HashMap.from_source(lambda: iter(divisions), len(divisions), max_hash=100)):
+        assert len(mapping) == len(divisions)
+        assert sorted(mapping, key=lambda item: item[0].name) == sorted(divisions, key=lambda item: item[0].name)
+        for div, value in divisions:
+            assert mapping[div] == value
+        assert Division('not a division name') not in mapping
+
+
+def test_bloom_filter():
+    names = list({rand_str(random.randint(3, 12)) for _ in range(2000)})
+    present, absent = names[:1000], names[1000:]
+    mapping = HashMap([(Division(name), name) for name in present], fp_rate=0.01)
+
+    for name in present:
+        assert mapping[Division(name)] == name
+    for name in absent:
+        assert Division(name) not in mapping
+
+    bloom_filter = mapping.bloom_filter
+    assert bloom_filter.hits >= len(present)
+    assert bloom_filter.misses >= 0.9 * len(absent)
+    assert HashMap([(Division(name), name) for name in present]).bloom_filter is None
+
+
+def test_attempts_limit():
+    with pytest.raises(RuntimeError):
+        HashMap([('a', None), (ord('a'), None)], max_hash=1)
+
+
+def test_iter():
+    divisions = [(div, rand_str(5)) for div in gen_items(500, Division, gen_div)]
+    mapping = HashMap(divisions)
+
+    assert sorted(mapping, key=lambda item: item[0].name) == sorted(divisions, key=lambda item: item[0].name)
+
+
+def test_frozen(tmp_path):
+    divisions = [(div, gen_items(random.randint(0, 5), Worker, gen_worker))
+                 for div in gen_items(500, Division, gen_div)]
+    filename = str(tmp_path / 'divisions.fks')
+    freeze(HashMap(divisions, max_hash=random.randint(10, 1000)), filename)
+
+    with FrozenHashMap(filename) as mapping:
+        assert len(mapping) == len(divisions)
+        assert len(list(mapping)) == len(divisions)
+
+        for div, workers in divisions:
+            assert div in mapping
+            assert mapping[div] == workers
+
+        for div in gen_items(100, Division, gen_div):
+            if div not in [item for item, _ in divisions]:
+                assert div not in mapping
+
+
+def test_parallel_build():
+    divisions = [(div, rand_str(5)) for div in gen_items(2000, Division, gen_div)]
+    mapping = HashMap(divisions, workers=2)
+
+    assert len(mapping) == len(divisions)
+    for div, value in divisions:
+        assert mapping[div] == value
+
+
+def test_get_many():
+    divisions = [(div, rand_str(5)) for div in gen_items(500, Division, gen_div)]
+    mapping = HashMap(divisions[:250], max_hash=random.randint(10, 1000))
+    keys = [div for div, _ in divisions]
+
+    assert mapping.contains_many(keys) == [i < 250 for i in range(len(keys))]
+    assert mapping.get_many(keys) == [value if i < 250 else None for i, (_, value) in enumerate(divisions)]
+
+
+def test_get_many_strings():
+    words = gen_items(1000, str, lambda _: rand_str(random.randint(1, 6)))
+    mapping = HashMap([(word, i) for i, word in enumerate(words[:500])])
+
+    assert mapping.get_many(words, -1) == [i if i < 500 else -1 for i in range(len(words))]
+
+
+def test_dynamic():
+    reference = {}
+    mapping = DynamicHashMap()
+
+    for _ in range(3000):
+        key = rand_str(random.randint(1, 3))
+
+        if random.random() < 0.7:
+            reference[key] = random.random()
+            mapping.insert(key, reference[key])
+        else:
+            reference.pop(key, None)
+            mapping.remove(key)
+
+    assert len(mapping) == len(reference)
+    assert dict(iter(mapping)) == reference
+
+    for key, value in reference.items():
+        assert key in mapping
+        assert mapping[key] == value
+
+
+@pytest.mark.parametrize('count', [1, 8])
+def test_dynamic_failed_insert(count):
+    # 'a' and 97 have equal vectors, so no hash function separates them
+    mapping = DynamicHashMap([('a', 1)] + [(str(i), i) for i in range(10, 10 + count - 1)], max_attempts=5)
+
+    with pytest.raises(RuntimeError):
+        mapping.insert(97, 2)
+    assert len(mapping) == count and sorted(mapping) == sorted([('a', 1)] + [(str(i), i) for i in range(10, 9 + count)])
+
+    mapping.insert('b', 3)
+    assert len(mapping) == count + 1 and mapping['b'] == 3 and 97 not in mapping
+
+
+@pytest.mark.parametrize('key', ['', 'Star Wars Jedi', 'Їжак \U0001F600', b'', b'bytes\x00\xff', 0, 42, 2 ** 32 - 1,
+                                 -1, 2 ** 32, -2 ** 70 - 3, ('Star', 'Wars', 7), Division('Avengers')])
+def test_to_vector(key):
+    if isinstance(key, str):
+        expected = [ord(sym) for sym in key]
+    elif isinstance(key, bytes):
+        expected = list(key) if len(key) > 0 else [0]
+    elif isinstance(key, int):
+        expected = [key] if 0 <= key < 2 ** 32 else [abs(key) >> shift & (2 ** 32 - 1)
+                                                     for shift in range(0, abs(key).bit_length(), 32)] + [key < 0]
+    elif isinstance(key, tuple):
+        expected = [val for item in key for val in to_vector(item)]
+    else:
+        expected = [ord(sym) for sym in key.name]
+
+    assert list(to_vector(key)) == expected
+
+
+def test_vector_cache():
+    div = Division('Sherlock')
+    vector = to_vector(div)
+
+    assert vector_cache.get(div) is vector
+    assert to_vector(div) is vector
+
+    cache_len = len(vector_cache)
+    del div
+    assert len(vector_cache) == cache_len - 1
+
+    assert list(to_vector(1.5)) == list(pickle.dumps(1.5, pickle.HIGHEST_PROTOCOL))
+
+
+@pytest.mark.parametrize('length', [0, 1, 10, 2000])
+def test_minimal(length):
+    divisions = [(div, rand_str(5)) for div in gen_items(2 * length, Division, gen_div)]
+    mapping = MinimalHashMap(divisions[:length] + divisions[:length // 2])
+
+    assert len(mapping) == length
+    assert len(mapping._keys) == length
+    assert sorted(mapping, key=lambda item: item[0].name) == \
+           sorted(divisions[:length], key=lambda item: item[0].name)
+
+    for i, (div, value) in enumerate(divisions):
+        if i < length:
+            assert mapping[div] == value
+        else:
+            assert div not in mapping
+
+    keys = [div for div, _ in divisions]
+    assert mapping.get_many(keys) == [value for _, value in divisions[:length]] + [None] * length
+    assert mapping.contains_many(keys) == [True] * length + [False] * length
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_hot_swap(processes):
+    old = [(div, rand_str(5)) for div in gen_items(200, Division, gen_div)]
+    new = [(div, rand_str(5)) for div in gen_items(300, Division, gen_div)]
+
+    with HotSwapMap(HashMap(old), processes) as mapping:
+        assert mapping.generation == 0
+        current = mapping.mapping
+        future = mapping.rebuild(new, collect_stats=True)
+
+        assert future.result() == mapping.generation == 1
+        assert all(current[div] == value for div, value in old)
+        assert len(mapping) == len(new) and mapping.stats.length == len(new)
+        assert mapping.get_many([div for div, _ in new]) == [value for _, value in new]
+        assert sorted(mapping, key=lambda item: item[0].name) == sorted(new, key=lambda item: item[0].name)
+
+        with pytest.raises(RuntimeError):
+            mapping.rebuild([('a', None), (97, None)], max_hash=1, max_attempts=1).result()
+        assert mapping.generation == 1 and len(mapping) == len(new)
+
+
+@pytest.mark.parametrize('table_count', [2, 3])
+def test_cuckoo(table_count):
+    divisions = gen_items(600, Division, gen_div)
+    expected = {}
+    mapping = CuckooHashMap([(div, 0) for div in divisions[:100]], table_count)
+    expected.update((div.name, 0) for div in divisions[:100])
+
+    for i in range(2000):
+        div = random.choice(divisions)
+        if random.random() < 0.7:
+            mapping.insert(div, i)
+            expected[div.name] = i
+        else:
+            mapping.remove(div)
+            expected.pop(div.name, None)
+
+        assert len(mapping) == len(expected)
+
+    assert sorted((div.name, value) for div, value in mapping) == sorted(expected.items())
+    for div in divisions:
+        assert (div in mapping) == (div.name in expected)
+        assert mapping.get_many([div], -1) == [expected.get(div.name, -1)]
+
+
+def test_cuckoo_update_at_threshold():
+    mapping = CuckooHashMap()
+    divisions = []
+
+    # fill the map up to its load limit, the next new key would double capacity
+    while len(mapping) + 1 <= mapping._max_load * mapping._table_count * mapping._capacity:
+        divisions.append(Division(rand_str(20)))
+        mapping.insert(divisions[-1], 0)
+    capacity, rehashes = mapping._capacity, mapping.rehashes
+
+    for div in divisions:
+        mapping.insert(div, 1)
+    assert mapping._capacity == capacity and mapping.rehashes == rehashes
+    assert all(value == 1 for _, value in mapping)
@@ -0,0 +1,88 @@
+import pickle
+import pytest
+import random
+import students
+from utils.students import Stream, Student
+from utils import rand_str, to_vector, vector_cache
+from lab1_ideal_hash.idealhash import HashMap
+from lab6_bx_tree.bxtree import BxTree
+
+
+def gen_student() -> Student:
+    return Student(rand_str(2), rand_str(2), rand_str(2), random.choice([60, 75.5, 90]))
+
+
+def test_student_order():
+    students = [gen_student() for _ in range(500)]
+    keys = [(student.avg, student.surname, student.name, student.patronymic) for student in students]
+
+    for _ in range(2000):
+        i, j = random.randrange(len(students)), random.randrange(len(students))
+        first, second = students[i], students[j]
+
+        assert (first < second, first <= second, first > second, first >= second, first == second, first != second) \
+            == (keys[i] < keys[j], keys[i] <= keys[j], keys[i] > keys[j], keys[i] >= keys[j],
+                keys[i] == keys[j], keys[i] != keys[j])
+        assert first != second or hash(first) == hash(second)
+
+    assert sorted(students) == [Student(*key[1:], key[0]) for key in sorted(keys)]
+    assert len(set(students)) == len(set(keys))
+
+
+def test_stream():
+    streams = [Stream(specialty, course) for specialty in ['b', 'a'] for course in (2, 1)]
+
+    assert sorted(streams) == [Stream('a', 1), Stream('b', 1), Stream('a', 2), Stream('b', 2)]
+    assert Stream('a', 1) in {Stream('a', 1)} and Stream('a', 1) != Stream('a', 2)
+    assert Stream('a', 1) != None
+
+
+def test_immutable():
+    student = gen_student()
+
+    with pytest.raises(AttributeError):
+        student.avg = 100
+    with pytest.raises(AttributeError):
+        student.extra = 1
+
+    assert pickle.loads(pickle.dumps(student)) == student
+    assert repr(pickle.loads(pickle.dumps(Stream('a', 1)))) == 'Stream("a", 1)'
+    assert to_vector(student) is to_vector(student) and vector_cache.get(student) is not None
+    copy = Student(student.surname, student.name, student.patronymic, student.avg)
+    assert list(to_vector(student)) == list(to_vector(copy))
+
+
+def test_other_types():
+    student, stream = gen_student(), Stream('a', 1)
+
+    for other in [1, 'a', None]:
+        assert student != other and stream != other
+        with pytest.raises(TypeError):
+            student < other
+        with pytest.raises(TypeError):
+            stream >= other
+
+    with pytest.raises(TypeError):
+        stream < student
+    with pytest.raises(TypeError):
+        student >= stream
+    assert stream != student and student != stream
+
+
+def test_int_and_float_avg():
+    int_students = [Student(rand_str(3), rand_str(3), rand_str(3), avg) for avg in range(60, 100)]
+    float_students = [Student(student.surname, student.name, student.patronymic, float(student.avg))
+                      for student in int_students]
+    other_copy = [students.Student(student.surname, student.name, student.patronymic, student.avg)
+                  for student in float_students]
+
+    assert int_students == float_students == other_copy and sorted(other_copy) == sorted(int_students)
+    assert [list(to_vector(student)) for student in int_students] == \
+           [list(to_vector(student)) for student in float_students]
+
+    mapping = HashMap([(student, i) for i, student in enumerate(int_students)])
+    assert mapping.get_many(float_students) == list(range(len(int_students)))
+
+    bxtree = BxTree(3, [(student, 1) for student in int_students], fp_rate=0.01,
+                    key_vector=lambda key: to_vector(key.fingerprint()))
+    assert all(student in bxtree for student in float_students + other_copy)
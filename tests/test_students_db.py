@@ -0,0 +1,315 @@
+import asyncio
+import pytest
+import itertools
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import aiodb
+from utils.students import Student
+from db.changefeed import ChangeFeed, remove_value
+from lab2_order_statistics.orderstattree import OrderStatTree
+from lab6_bx_tree.bxtree import BxTree
+from utils import STREAMS, fetch_stream_students, fetch_grouped_students, stream_cache
+from db.students_db import ConnectionPool, RowCache, DB_FILE, POOL_SIZE, fetch_by_query, iter_by_query, \
+    change_with_query
+
+
+QUERY = 'SELECT count(*) FROM students WHERE stream_id=:stream_id'
+
+
+def test_concurrent_fetch():
+    stream_ids = [stream_id for stream_id, in fetch_by_query('SELECT id FROM streams', {})]
+    expected = [fetch_by_query(QUERY, {'stream_id': stream_id}) for stream_id in stream_ids]
+
+    with ThreadPoolExecutor(8) as executor:
+        for _ in range(10):
+            assert list(executor.map(lambda stream_id: fetch_by_query(QUERY, {'stream_id': stream_id}),
+                                     stream_ids)) == expected
+
+
+def test_iter_by_query():
+    query = 'SELECT * FROM students ORDER BY surname, name'
+    rows = iter_by_query(query, {}, batch_size=7)
+
+    assert next(rows) == fetch_by_query(query, {})[0]
+    assert [next(rows)] + list(rows) == fetch_by_query(query, {})[1:]
+    assert list(iter_by_query('SELECT * FROM students WHERE total < 0', {})) == []
+
+
+def test_interleaved_iter_by_query():
+    query = 'SELECT * FROM students WHERE stream_id=:stream_id'
+    stream_ids = [stream_id for stream_id, in fetch_by_query('SELECT DISTINCT stream_id FROM students', {})]
+    assert len(stream_ids) > POOL_SIZE
+
+    streams = [iter_by_query(query, {'stream_id': stream_id}, batch_size=2) for stream_id in stream_ids]
+    rows = [[] for _ in stream_ids]
+
+    for row_tuple in itertools.zip_longest(*streams):
+        for stream_rows, row in zip(rows, row_tuple):
+            if row is not None:
+                stream_rows.append(row)
+
+    assert rows == [fetch_by_query(query, {'stream_id': stream_id}) for stream_id in stream_ids]
+
+
+def test_streams_and_point_queries():
+    query = 'SELECT * FROM students ORDER BY rowid'
+    expected = fetch_by_query(query, {})
+
+    def one_thread() -> None:
+        streams = [iter_by_query(query, {}, batch_size=2) for _ in range(POOL_SIZE)]
+        assert [next(rows) for rows in streams] == [expected[0]] * POOL_SIZE
+        assert fetch_by_query(query, {}) == expected
+
+    def lookup_while_streaming() -> list:
+        rows = []
+        for row in iter_by_query(query, {}, batch_size=2):
+            rows.append(row)
+            if len(rows) == 3:
+                assert fetch_by_query(QUERY, {'stream_id': row[-1]})[0][0] > 0
+        return rows
+
+    def worker_threads() -> None:
+        with ThreadPoolExecutor(POOL_SIZE) as executor:
+            assert list(executor.map(lambda _: lookup_while_streaming(), range(POOL_SIZE))) == [expected] * POOL_SIZE
+
+    run_with_timeout(one_thread)
+    run_with_timeout(worker_threads)
+
+
+def test_grouped_students():
+    groups = {(stream.specialty, stream.course): students for stream, students in fetch_grouped_students()}
+
+    assert sum(len(students) for students in groups.values()) == fetch_by_query('SELECT count(*) FROM students', {})[0][0]
+    for stream in STREAMS:
+        assert sorted(groups.get((stream.specialty, stream.course), [])) == sorted(fetch_stream_students(stream))
+
+
+def test_row_cache():
+    cache = RowCache(max_rows=10)
+    cache.put('a', [(1,)] * 4, cache.generation)
+    cache.put('b', [(2,)] * 4, cache.generation)
+    assert cache.get('a') == [(1,)] * 4
+
+    cache.put('c', [(3,)] * 4, cache.generation)
+    assert cache.get('b') is None and len(cache) == 2 and cache.rows == 8
+
+    generation = cache.generation
+    cache.clear()
+    cache.put('d', [(4,)], generation)
+    assert len(cache) == 0
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 0, 'rows': 0}
+
+
+def test_stream_cache():
+    stream = STREAMS[7]
+    stream_cache.clear()
+    students = list(fetch_stream_students(stream))
+    hits = stream_cache.stats()['hits']
+
+    assert list(fetch_stream_students(stream)) == students
+    assert stream_cache.stats()['hits'] == hits + 1
+
+    change_with_query('UPDATE students SET total=total WHERE 0', {})
+    assert len(stream_cache) == 0
+    assert list(fetch_stream_students(stream)) == students
+    # every module imports students_db by one name, so there is one set of pools and listeners
+    assert 'utils.db.students_db' not in sys.modules
+
+
+def test_read_pool_sees_writes(tmp_path):
+    path = str(tmp_path / 'students.sqlite3')
+    shutil.copy(DB_FILE, path)
+    read_pool, write_pool = ConnectionPool(path, read_only=True), ConnectionPool(path, size=1)
+    count_query = 'SELECT count(*) FROM students'
+
+    with read_pool.connection() as connection:
+        count = connection.execute(count_query).fetchone()[0]
+
+    with write_pool.connection() as connection:
+        with connection:
+            connection.execute('DELETE FROM students WHERE stream_id=(SELECT min(stream_id) FROM students)')
+
+    with read_pool.connection() as connection:
+        assert connection.execute(count_query).fetchone()[0] < count
+
+    read_pool.invalidate()
+    with read_pool.connection() as connection:
+        assert connection.execute(count_query).fetchone()[0] < count
+
+    read_pool.close()
+    write_pool.close()
+
+
+def test_async():
+    async def load() -> tuple:
+        rows = await aiodb.fetch_by_query(QUERY, {'stream_id': 3})
+        streamed = [row async for row in aiodb.iter_by_query('SELECT * FROM students', {}, batch_size=50)]
+        groups = {(stream.specialty, stream.course): students
+                  async for stream, students in aiodb.fetch_streams(STREAMS)}
+        return (rows, streamed, groups)
+
+    rows, streamed, groups = asyncio.run(load())
+
+    assert rows == fetch_by_query(QUERY, {'stream_id': 3})
+    assert streamed == fetch_by_query('SELECT * FROM students', {})
+    for stream in STREAMS:
+        assert groups[(stream.specialty, stream.course)] == list(fetch_stream_students(stream))
+
+
+def test_async_many_streams():
+    query = 'SELECT * FROM students'
+
+    async def collect(rows) -> list:
+        return [row async for row in rows]
+
+    async def first_rows(count: int) -> list:
+        rows = aiodb.iter_by_query(query, {}, batch_size=10)
+        result = [row async for row in take(rows, count)]
+        await rows.aclose()
+        return result
+
+    async def load() -> tuple:
+        streams = [collect(aiodb.iter_by_query(query, {}, batch_size=10)) for _ in range(2 * POOL_SIZE)]
+        partial = [first_rows(15) for _ in range(2 * POOL_SIZE)]
+        return await asyncio.wait_for(asyncio.gather(asyncio.gather(*streams), asyncio.gather(*partial)), 20)
+
+    streamed, partial = asyncio.run(load())
+    expected = fetch_by_query(query, {})
+
+    assert streamed == [expected] * (2 * POOL_SIZE)
+    assert partial == [expected[:15]] * (2 * POOL_SIZE)
+
+
+def test_async_backpressure():
+    pulled = []
+    closed = threading.Event()
+
+    def numbers():
+        try:
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+        finally:
+            closed.set()
+
+    async def consume() -> list:
+        rows = aiodb.iterate_blocking(numbers, batch_size=10)
+        result = []
+
+        async for i in rows:
+            result.append(i)
+            await asyncio.sleep(0.01)
+            if len(result) == 25:
+                break
+        # slow consumer and early exit both leave at most the current and the prefetched batch fetched
+        await asyncio.sleep(0.1)
+        assert len(pulled) <= 40 and not closed.is_set()
+
+        await rows.aclose()
+        return result
+
+    assert asyncio.run(consume()) == list(range(25))
+    assert closed.is_set()
+
+
+def test_change_feed(tmp_path):
+    path = str(tmp_path / 'students.sqlite3')
+    shutil.copy(DB_FILE, path)
+    pool = ConnectionPool(path, size=1)
+    columns = ['name', 'surname', 'patronymic', 'total', 'stream_id']
+
+    def fullname(row: tuple) -> str:
+        return ' '.join([row[1], row[0], row[2]])
+
+    def build() -> tuple:
+        feed = ChangeFeed('students', columns, pool, 'indexes')
+        by_name, by_stream = BxTree(10), OrderStatTree()
+        feed.register(by_name, fullname, lambda row: (row[3], row[4]))
+        feed.register(by_stream, lambda row: row[4], lambda row: Student(row[1], row[0], row[2], row[3]),
+                      remove_value)
+        return (feed, by_name, by_stream, feed.load())
+
+    feed, by_name, by_stream, count = build()
+    assert count == len(by_name) == 643
+
+    with pool.connection() as connection:
+        with connection:
+            student = connection.execute('SELECT * FROM students LIMIT 1').fetchone()
+            connection.execute("INSERT INTO students VALUES ('Ім''я', 'Прізвище', 'По батькові', 99.5, 3)")
+            connection.execute('UPDATE students SET total=60, stream_id=4 WHERE rowid=2')
+            connection.execute('DELETE FROM students WHERE rowid=1')
+
+    assert feed.refresh() == 3
+    assert feed.refresh() == 0
+    assert fullname(student) not in by_name
+
+    _, rebuilt_by_name, rebuilt_by_stream, _ = build()
+    assert list(by_name) == list(rebuilt_by_name)
+    assert [(key, sorted(values)) for key, values in groupby_key(by_stream)] == \
+           [(key, sorted(values)) for key, values in groupby_key(rebuilt_by_stream)]
+
+    feed.trim()
+    with pool.connection() as connection:
+        assert connection.execute(f'SELECT count(*) FROM {feed.changelog}').fetchone()[0] == 0
+    pool.close()
+
+
+def test_separate_change_feeds(tmp_path):
+    path = str(tmp_path / 'students.sqlite3')
+    shutil.copy(DB_FILE, path)
+    pool = ConnectionPool(path, size=1)
+    by_name, by_total = BxTree(10), OrderStatTree()
+
+    names = ChangeFeed('students', ['surname', 'name'], pool, 'names')
+    names.register(by_name, lambda row: ' '.join(row))
+    totals = ChangeFeed('students', ['total'], pool, 'totals')
+    totals.register(by_total, lambda row: row[0], remove=remove_value)
+    names.load(), totals.load()
+
+    with pytest.raises(ValueError):
+        ChangeFeed('students', ['total', 'stream_id'], pool, 'totals')
+
+    with pool.connection() as connection:
+        with connection:
+            connection.execute("INSERT INTO students VALUES ('Ім''я', 'Прізвище', 'По батькові', 99.5, 3)")
+
+    assert names.refresh() == 1
+    names.trim()
+    assert totals.refresh() == 1
+    assert 'Прізвище Ім\'я' in by_name and by_total.get(99.5) == [None]
+    pool.close()
+
+
+def groupby_key(tree) -> list:
+    return [(key, [value for _, value in group]) for key, group in itertools.groupby(tree, key=lambda item: item[0])]
+
+
+async def take(rows, count: int):
+    async for row in rows:
+        if count == 0:
+            return
+        count -= 1
+        yield row
+
+
+def run_with_timeout(func, timeout: float = 20) -> None:
+    """
+    Runs func in daemon thread, so a deadlock fails the test instead of hanging it
+    """
+    errors = []
+
+    def target() -> None:
+        try:
+            func()
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+
+    assert not thread.is_alive(), f'{func.__name__} did not finish in {timeout} s'
+    if len(errors) > 0:
+        raise errors[0]
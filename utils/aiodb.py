@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Mapping, Tuple, TypeVar
+from students import Stream, Student
+from db.students_db import POOL_SIZE, BATCH_SIZE
+from db import students_db
+import utils
+
+
+T = TypeVar('T')
+
+executor = ThreadPoolExecutor(POOL_SIZE, thread_name_prefix='students-db')
+
+
+async def run_blocking(func: Callable[..., T], *args) -> T:
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def iterate_blocking(make_iterator: Callable[[], Iterator[T]], batch_size: int = BATCH_SIZE) -> AsyncIterator[T]:
+    """
+    Pulls batches of batch_size items from iterator made by make_iterator, one executor call per batch,
+    the next batch is fetched while the current one is consumed, so at most two batches are in memory.
+    Executor calls never wait for the consumer, and streaming connections of students_db take no pool slot,
+    so they never wait for each other either.
+    Leaving async for early stops fetching (the prefetched batch is dropped), but the iterator and its connection
+    are closed only with the async iterator: by aclose (e.g. contextlib.aclosing) or when it is garbage collected
+    """
+    iterator = make_iterator()
+
+    def fetch() -> Future:
+        return executor.submit(lambda: list(itertools.islice(iterator, batch_size)))
+
+    # concurrent futures are kept, so a fetch which was already running when the consumer was cancelled
+    # is still waited for before the iterator is closed
+    pending = fetch()
+
+    try:
+        while len(batch := await asyncio.wrap_future(pending)) > 0:
+            pending = fetch()
+            for item in batch:
+                yield item
+    finally:
+        if not pending.cancel():
+            await asyncio.wait([asyncio.wrap_future(pending)])
+        if hasattr(iterator, 'close'):
+            await run_blocking(iterator.close)
+
+
+async def fetch_by_query(query: str, params: Mapping) -> List[Tuple]:
+    return await run_blocking(students_db.fetch_by_query, query, params)
+
+
+def iter_by_query(query: str, params: Mapping, batch_size: int = BATCH_SIZE) -> AsyncIterator[Tuple]:
+    return iterate_blocking(lambda: students_db.iter_by_query(query, params, batch_size), batch_size)
+
+
+def fetch_stream_students(stream: Stream) -> AsyncIterator[Student]:
+    """
+    Async version of utils.fetch_stream_students, sharing its cache
+    """
+    return iterate_blocking(lambda: utils.fetch_stream_students(stream))
+
+
+async def fetch_streams(streams: Iterable[Stream]) -> AsyncIterator[Tuple[Stream, List[Student]]]:
+    """
+    Fetches students of all streams concurrently and yields (stream, students) as soon as each one is ready
+    """
+    async def fetch(stream: Stream) -> Tuple[Stream, List[Student]]:
+        return (stream, [student async for student in fetch_stream_students(stream)])
+
+    for result in asyncio.as_completed([fetch(stream) for stream in streams]):
+        yield await result
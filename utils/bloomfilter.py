@@ -0,0 +1,102 @@
+import math
+import random
+from utils import find_greater_prime, to_vector, PowerTable
+from typing import Any, Sequence
+
+
+FP_RATE = 0.01
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float = FP_RATE) -> None:
+        """
+        Set of keys with false positives and without false negatives, to answer most misses
+        before looking into the main structure.
+        For capacity keys and false positive rate p it takes m = -capacity * ln(p) / ln(2) ** 2 bits
+        and k = m / capacity * ln(2) hash functions h1 + i * h2, where h1 and h2 are polynomial hashes
+        with random parameters, as in HashMap
+        """
+        self._capacity = max(capacity, 1)
+        self._fp_rate = fp_rate
+        self._bit_count = max(8, math.ceil(-self._capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self._hash_count = max(1, round(self._bit_count / self._capacity * math.log(2)))
+        self._bits = bytearray((self._bit_count + 7) // 8)
+        self._length = 0
+        self._hits = self._misses = 0
+
+        self._prime = find_greater_prime(self._bit_count ** 2)
+        self._params = [(random.randrange(1, self._prime), random.randrange(0, self._prime)) for _ in range(2)]
+        self._powers = [PowerTable(a, self._prime) for a, _ in self._params]
+
+    def _positions(self, vector: Sequence[int]) -> range:
+        """
+        Returns positions of k bits of vector, stepping h2 from h1 (taken modulo bit_count)
+        """
+        h1, h2 = ((powers.poly_hash(vector) + b) % self._prime for powers, (_, b) in zip(self._powers, self._params))
+        start, step = h1 % self._bit_count, h2 % (self._bit_count - 1) + 1
+
+        return range(start, start + step * self._hash_count, step)
+
+    def add_vector(self, vector: Sequence[int]) -> None:
+        for pos in self._positions(vector):
+            pos %= self._bit_count
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+        self._length += 1
+
+    def contains_vector(self, vector: Sequence[int]) -> bool:
+        for pos in self._positions(vector):
+            pos %= self._bit_count
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                self._misses += 1
+                return False
+
+        self._hits += 1
+        return True
+
+    def add(self, key: Any) -> None:
+        self.add_vector(to_vector(key))
+
+    def reset_stats(self) -> None:
+        self._hits = self._misses = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def fp_rate(self) -> float:
+        return self._fp_rate
+
+    @property
+    def hits(self) -> int:
+        """
+        Lookups answered with 'maybe', which had to go to the main structure
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Lookups answered with 'no' by the filter alone
+        """
+        return self._misses
+
+    @property
+    def expected_fp_rate(self) -> float:
+        """
+        False positive rate for number of added keys: (1 - e ** (-k * n / m)) ** k
+        """
+        return (1 - math.exp(-self._hash_count * self._length / self._bit_count)) ** self._hash_count
+
+    def __len__(self) -> int:
+        """
+        Number of added keys (with repetitions)
+        """
+        return self._length
+
+    def __contains__(self, key: Any) -> bool:
+        return self.contains_vector(to_vector(key))
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self._capacity}, {self._fp_rate})'
@@ -0,0 +1,88 @@
+from array import array
+from typing import Iterator, List, Mapping, Optional, Tuple
+import numpy as np
+from students import Stream, Student
+from db.students_db import iter_by_query, BATCH_SIZE
+
+
+ALL_STUDENTS = 'SELECT stud.surname, stud.name, stud.patronymic, stud.total, stud.stream_id FROM students stud'
+STREAM_STUDENTS = f"""{ALL_STUDENTS} LEFT JOIN streams s ON stud.stream_id=s.id
+                      WHERE s.name LIKE :spec AND s.course=:course"""
+
+
+class StudentColumns:
+    def __init__(self) -> None:
+        """
+        Students as columns: names in lists, averages and stream ids in typed arrays.
+        Rows are sorted once with numpy and handed to trees as sorted runs, so building an index
+        takes no comparisons of Student objects
+        """
+        self.surnames: List[str] = []
+        self.names: List[str] = []
+        self.patronymics: List[str] = []
+        self.totals = array('d', [])
+        self.stream_ids = array('q', [])
+
+    @classmethod
+    def fetch(cls, query: str = ALL_STUDENTS, params: Optional[Mapping] = None,
+              batch_size: int = BATCH_SIZE) -> 'StudentColumns':
+        """
+        query should select surname, name, patronymic, total and stream id
+        """
+        columns = cls()
+
+        for surname, name, patronymic, total, stream_id in iter_by_query(query, params or {}, batch_size):
+            columns.surnames.append(surname)
+            columns.names.append(name)
+            columns.patronymics.append(patronymic)
+            columns.totals.append(total)
+            columns.stream_ids.append(stream_id)
+
+        return columns
+
+    @classmethod
+    def fetch_stream(cls, stream: Stream) -> 'StudentColumns':
+        return cls.fetch(STREAM_STUDENTS, {'spec': f'{stream.specialty}%', 'course': stream.course})
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def student(self, i: int) -> Student:
+        return Student(self.surnames[i], self.names[i], self.patronymics[i], self.totals[i])
+
+    def _student_columns(self) -> List[np.ndarray]:
+        """
+        Columns in order of Student comparison: average, surname, name, patronymic
+        """
+        return [np.frombuffer(self.totals, dtype=np.float64), np.array(self.surnames, dtype=str),
+                np.array(self.names, dtype=str), np.array(self.patronymics, dtype=str)]
+
+    def student_runs(self) -> List[Tuple[Student, List[None]]]:
+        """
+        (Student, [None, ...]) runs in ascending order of students, equal students form one run,
+        ready for bulk_load of SplayTree or OrderStatTree
+        """
+        if len(self) == 0:
+            return []
+
+        columns = self._student_columns()
+        order = np.lexsort(columns[::-1])
+        sorted_columns = [column[order] for column in columns]
+
+        # run starts where any column differs from the previous row
+        starts = np.flatnonzero(np.any([column[1:] != column[:-1] for column in sorted_columns], axis=0)) + 1
+        bounds = [0] + starts.tolist() + [len(self)]
+        order = order.tolist()
+
+        return [(self.student(order[start]), [None] * (end - start)) for start, end in zip(bounds, bounds[1:])]
+
+    def fullname_items(self) -> Iterator[Tuple[str, Tuple[float, int]]]:
+        """
+        ('surname name patronymic', (average, stream id)) pairs in ascending order of full names,
+        ready for BxTree.bulk_load
+        """
+        fullnames = [' '.join(parts) for parts in zip(self.surnames, self.names, self.patronymics)]
+        order = np.argsort(np.array(fullnames, dtype=str), kind='stable').tolist()
+
+        for i in order:
+            yield (fullnames[i], (self.totals[i], self.stream_ids[i]))
@@ -0,0 +1,169 @@
+import sqlite3
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+from db.students_db import ConnectionPool
+
+
+# change kinds in changelog table
+INSERT, UPDATE, DELETE = 'I', 'U', 'D'
+
+RowFunc = Callable[[Tuple], Any]
+RemoveFunc = Callable[[Any, Any, Any], None]
+
+
+def remove_key(index: Any, key: Any, value: Any) -> None:
+    """
+    Removes entry of index with one value per key, e.g. BxTree
+    """
+    index.remove(key)
+
+
+def remove_value(index: Any, key: Any, value: Any) -> None:
+    """
+    Removes one (key, value) entry of tree with several values per key and remove(key, pos),
+    e.g. OrderStatTree or SplayTree, position of value is looked up
+    """
+    try:
+        values = index.get(key)
+    except KeyError:
+        return
+
+    if value in values:
+        index.remove(key, list(values).index(value))
+
+
+class ChangeFeed:
+    def __init__(self, table: str, columns: Sequence[str], pool: ConnectionPool, name: str) -> None:
+        """
+        Keeps indexes built from table in sync with it. Triggers log every insert, update and delete
+        with old and new values of columns into {table}_{name}_changes, and refresh applies only entries
+        after the last seen sequence number to registered indexes as insert/remove calls.
+        Every feed has its own changelog and triggers, so trim of one feed never drops changes another one
+        has not seen. Feeds with the same name share them and must have the same columns (ValueError otherwise).
+        Triggers and changelog are added to the database of pool, which grows with every write until trim,
+        so there is no default pool: feeds on the shared students database have to be asked for explicitly
+        """
+        self._table = table
+        self._name = name
+        self._columns = list(columns)
+        self._pool = pool
+        self._indexes: List[Tuple[Any, RowFunc, RowFunc, RemoveFunc]] = []
+        self._last_seq = 0
+        self._install()
+
+    @property
+    def changelog(self) -> str:
+        return f'{self._table}_{self._name}_changes'
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def _install(self) -> None:
+        old_columns = ', '.join(f'old_{column}' for column in self._columns)
+        new_columns = ', '.join(f'new_{column}' for column in self._columns)
+        old_values = ', '.join(f'OLD.{column}' for column in self._columns)
+        new_values = ', '.join(f'NEW.{column}' for column in self._columns)
+        nulls = ', '.join('NULL' for _ in self._columns)
+
+        triggers = [(INSERT, 'INSERT', f'{nulls}, {new_values}'),
+                    (UPDATE, 'UPDATE', f'{old_values}, {new_values}'),
+                    (DELETE, 'DELETE', f'{old_values}, {nulls}')]
+
+        with self._pool.connection() as connection:
+            with connection:
+                connection.execute(f"""CREATE TABLE IF NOT EXISTS {self.changelog}(
+                                       seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                                       op TEXT,
+                                       {', '.join(f'old_{column}, new_{column}' for column in self._columns)}
+                                       )""")
+
+                self._check_schema(connection)
+
+                for op, event, values in triggers:
+                    connection.execute(f"""CREATE TRIGGER IF NOT EXISTS {self.changelog}_{event.lower()}
+                                           AFTER {event} ON {self._table} BEGIN
+                                           INSERT INTO {self.changelog}(op, {old_columns}, {new_columns})
+                                           VALUES ('{op}', {values});
+                                           END""")
+
+    def _check_schema(self, connection: sqlite3.Connection) -> None:
+        expected = ['seq', 'op'] + [f'{prefix}_{column}' for column in self._columns for prefix in ('old', 'new')]
+        existing = [column for _, column, *_ in connection.execute(f'PRAGMA table_info({self.changelog})')]
+
+        if existing != expected:
+            raise ValueError(f'{self.changelog} has columns {existing}, expected {expected}')
+
+    def register(self, index: Any, key: RowFunc, value: Optional[RowFunc] = None,
+                 remove: RemoveFunc = remove_key) -> None:
+        """
+        index gets (key(row), value(row)) for every row of table, rows are tuples of columns.
+        Entries of changed and deleted rows are removed with remove(index, key, value),
+        remove_value should be used for indexes with several values per key
+        """
+        self._indexes.append((index, key, (lambda row: None) if value is None else value, remove))
+
+    def load(self) -> int:
+        """
+        Fills registered indexes with current rows and remembers the position in changelog.
+        Returns number of rows
+        """
+        with self._pool.connection() as connection:
+            with connection:
+                connection.execute('BEGIN')
+                self._last_seq = connection.execute(f'SELECT coalesce(max(seq), 0) FROM {self.changelog}').fetchone()[0]
+                rows = connection.execute(f'SELECT {", ".join(self._columns)} FROM {self._table}')
+
+                count = 0
+                for row in rows:
+                    self._insert(row)
+                    count += 1
+
+        return count
+
+    def changes(self) -> Iterator[Tuple[int, str, Tuple, Tuple]]:
+        """
+        Yields seq, op, old and new row of changes after the last seen one
+        """
+        width = len(self._columns)
+
+        with self._pool.connection() as connection:
+            rows = connection.execute(f"""SELECT seq, op, {', '.join(f'old_{column}' for column in self._columns)},
+                                          {', '.join(f'new_{column}' for column in self._columns)}
+                                          FROM {self.changelog} WHERE seq > :seq ORDER BY seq""",
+                                      {'seq': self._last_seq}).fetchall()
+
+        for seq, op, *values in rows:
+            yield (seq, op, tuple(values[:width]), tuple(values[width:]))
+
+    def refresh(self) -> int:
+        """
+        Applies changes after the last seen one to registered indexes, returns their number
+        """
+        count = 0
+
+        for seq, op, old_row, new_row in self.changes():
+            if op in (UPDATE, DELETE):
+                self._remove(old_row)
+            if op in (INSERT, UPDATE):
+                self._insert(new_row)
+
+            self._last_seq = seq
+            count += 1
+
+        return count
+
+    def trim(self) -> None:
+        """
+        Deletes changes which were already seen
+        """
+        with self._pool.connection() as connection:
+            with connection:
+                connection.execute(f'DELETE FROM {self.changelog} WHERE seq <= :seq', {'seq': self._last_seq})
+
+    def _insert(self, row: Tuple) -> None:
+        for index, key, value, _ in self._indexes:
+            index.insert(key(row), value(row))
+
+    def _remove(self, row: Tuple) -> None:
+        for index, key, value, remove in self._indexes:
+            remove(index, key(row), value(row))
@@ -1,18 +1,214 @@
+import collections
+import contextlib
+import pathlib
+import queue
 import sqlite3
 import os
-from typing import List, Tuple, Mapping
+import threading
+from typing import Any, Callable, Hashable, Iterator, List, Optional, Tuple, Mapping
 
 
 db_path = os.path.dirname(os.path.abspath(__file__))
-connection = sqlite3.connect(f'{db_path}/students.sqlite3')
-cursor = connection.cursor()
+DB_FILE = f'{db_path}/students.sqlite3'
+POOL_SIZE = 4
+CACHED_STATEMENTS = 256
+BATCH_SIZE = 256
+CACHE_ROWS = 10000
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = POOL_SIZE, read_only: bool = False) -> None:
+        """
+        Up to size connections to path, opened on first use and shared between threads by checkout:
+        connection is used by one thread at a time and returned to the pool afterwards.
+        Read only pool opens database with mode=ro, so its connections still see writes made through other ones.
+        After invalidate idle connections are closed and checked out ones are closed on return instead of being reused.
+        Every connection keeps up to CACHED_STATEMENTS prepared statements, so repeated queries are not recompiled
+        """
+        self._path = path
+        self._read_only = read_only
+        self._size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = pathlib.Path(self._path).as_uri() + ('?mode=ro' if self._read_only else '')
+        return sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+
+    def _checkout(self, streaming: bool) -> Tuple[sqlite3.Connection, int]:
+        """
+        Waits for free slot (unless streaming), then takes idle connection of current generation or opens new one
+        """
+        if not streaming:
+            self._slots.acquire()
+
+        try:
+            while True:
+                try:
+                    connection, generation = self._idle.get_nowait()
+                except queue.Empty:
+                    generation = self._generation
+                    return (self._connect(), generation)
+
+                if generation == self._generation:
+                    return (connection, generation)
+                connection.close()
+        except BaseException:
+            if not streaming:
+                self._slots.release()
+            raise
+
+    def _release(self, connection: sqlite3.Connection, generation: int, streaming: bool) -> None:
+        if generation == self._generation and self._idle.qsize() < self._size:
+            self._idle.put((connection, generation))
+        else:
+            connection.close()
+
+        if not streaming:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self, streaming: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Connection is held until the block exits. Streaming holders (e.g. suspended generators) can keep
+        their connection for any time, so they take no slot: they never wait for one and never make
+        short queries wait, at the cost of connections beyond size while many streams are open
+        """
+        connection, generation = self._checkout(streaming)
+
+        try:
+            yield connection
+        finally:
+            self._release(connection, generation, streaming)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            connection.close()
+
+    def close(self) -> None:
+        self.invalidate()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+
+class RowCache:
+    def __init__(self, max_rows: int = CACHE_ROWS) -> None:
+        """
+        LRU cache of query results holding at most max_rows rows in total.
+        Results are put with generation they were fetched at, so results of queries
+        which overlapped with clear (i.e. a write) are not cached
+        """
+        self._max_rows = max_rows
+        self._entries = collections.OrderedDict()
+        self._rows = 0
+        self._generation = 0
+        self._hits = self._misses = self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[List[Tuple]]:
+        with self._lock:
+            rows = self._entries.get(key)
+
+            if rows is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+
+            return rows
+
+    def put(self, key: Hashable, rows: List[Tuple], generation: int) -> None:
+        with self._lock:
+            if generation != self._generation or len(rows) > self._max_rows:
+                return
+
+            if key in self._entries:
+                self._rows -= len(self._entries.pop(key))
+
+            self._entries[key] = rows
+            self._rows += len(rows)
+
+            while self._rows > self._max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+            self._generation += 1
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def max_rows(self) -> int:
+        return self._max_rows
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def stats(self) -> Mapping[str, Any]:
+        return {'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions,
+                'entries': len(self._entries), 'rows': self._rows}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_write_listeners: List[Callable[[], None]] = []
+
+
+def add_write_listener(listener: Callable[[], None]) -> None:
+    """
+    listener is called after every change_with_query, e.g. to invalidate caches
+    """
+    _write_listeners.append(listener)
+
+
+read_pool = ConnectionPool(DB_FILE, read_only=True)
+write_pool = ConnectionPool(DB_FILE, size=1)
 
 
 def fetch_by_query(query: str, params: Mapping) -> List[Tuple]:
-    cursor.execute(query, params)
-    return cursor.fetchall()
+    with read_pool.connection() as connection:
+        return connection.execute(query, params).fetchall()
+
+
+def iter_by_query(query: str, params: Mapping, batch_size: int = BATCH_SIZE) -> Iterator[Tuple]:
+    """
+    Yields rows fetched in batches of batch_size, connection stays checked out until the generator is closed.
+    Streaming connection takes no pool slot, so unfinished generators never block fetch_by_query or each other
+    """
+    with read_pool.connection(streaming=True) as connection:
+        cursor = connection.execute(query, params)
+
+        try:
+            while len(rows := cursor.fetchmany(batch_size)) > 0:
+                yield from rows
+        finally:
+            cursor.close()
 
 
 def change_with_query(query: str, params: Mapping) -> None:
-    with connection:
-        cursor.execute(query, params)
+    with write_pool.connection() as connection:
+        with connection:
+            connection.execute(query, params)
+
+    for listener in _write_listeners:
+        listener()
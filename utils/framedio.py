@@ -0,0 +1,169 @@
+import bisect
+import bz2
+import lzma
+import mmap
+import pickle
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+MAGIC = b'PKLF'
+VERSION = 2
+FRAME_SIZE = 1 << 20
+
+# compression name -> (id, compress, decompress)
+COMPRESSIONS = {
+    None: (0, bytes, bytes),
+    'zlib': (1, zlib.compress, zlib.decompress),
+    'bz2': (2, bz2.compress, bz2.decompress),
+    'lzma': (3, lzma.compress, lzma.decompress),
+}
+
+# magic, version, compression id
+HEADER = struct.Struct('<4sHH')
+# file offset, stored length, raw length, first record
+FRAME = struct.Struct('<QQQQ')
+# record offset inside its raw frame
+RECORD = struct.Struct('<I')
+# frame count, record count, footer offset, magic
+TRAILER = struct.Struct('<QQQ4s')
+
+
+def is_framed(filename: str) -> bool:
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+
+    return arr.tobytes()
+
+
+def write_frames(filename: str, sequence: Iterable[Any], compression: Optional[str] = None,
+                 frame_size: int = FRAME_SIZE) -> None:
+    """
+    Writes pickles of objects batched into frames of about frame_size bytes, each compressed as a whole.
+    Footer keeps frame table and offset of every record inside its frame, trailer points at the footer.
+    All numbers are little-endian
+    """
+    compression_id, compress, _ = COMPRESSIONS[compression]
+    frames, record_offsets = array('Q', []), array('I', [])
+    frame, first_record = bytearray(), 0
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, compression_id))
+
+        for obj in sequence:
+            record_offsets.append(len(frame))
+            frame += pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+            if len(frame) >= frame_size:
+                _write_frame(f, frame, first_record, compress, frames)
+                frame, first_record = bytearray(), len(record_offsets)
+
+        if len(frame) > 0:
+            _write_frame(f, frame, first_record, compress, frames)
+
+        footer_offset = f.tell()
+        f.write(_le_bytes(frames))
+        f.write(_le_bytes(record_offsets))
+        f.write(TRAILER.pack(len(frames) // 4, len(record_offsets), footer_offset, MAGIC))
+
+
+def _write_frame(f: BinaryIO, frame: bytearray, first_record: int, compress: Callable[[bytes], bytes],
+                 frames: array) -> None:
+    stored = compress(bytes(frame))
+    frames.extend([f.tell(), len(stored), len(frame), first_record])
+    f.write(stored)
+
+
+class FramedReader:
+    def __init__(self, filename: str) -> None:
+        """
+        Memory mapped reader of files written by write_frames with len(), indexing and slicing.
+        Record is found with binary search over frame table, frame is read with one slice of the mapping
+        and the last decompressed frame is cached
+        """
+        with open(filename, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, compression_id = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f'{filename} is not a framed file of version {VERSION}')
+
+        self._decompress = next(decompress for comp_id, _, decompress in COMPRESSIONS.values()
+                                if comp_id == compression_id)
+
+        frame_count, self._length, footer_offset, _ = TRAILER.unpack_from(self._mm, len(self._mm) - TRAILER.size)
+        self._frames = [FRAME.unpack_from(self._mm, footer_offset + FRAME.size * i) for i in range(frame_count)]
+        self._first_records = [frame[3] for frame in self._frames]
+        self._records_pos = footer_offset + FRAME.size * frame_count
+        self._cached_frame = (-1, b'')
+
+    def __enter__(self) -> 'FramedReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._cached_frame = (-1, b'')
+        self._mm.close()
+
+    def _frame_data(self, frame_num: int) -> bytes:
+        if self._cached_frame[0] != frame_num:
+            offset, stored_len, _, _ = self._frames[frame_num]
+            self._cached_frame = (frame_num, self._decompress(self._mm[offset: offset + stored_len]))
+
+        return self._cached_frame[1]
+
+    def _record_bounds(self, frame_num: int, index: int) -> Tuple[int, int]:
+        raw_len = self._frames[frame_num][2]
+        start = RECORD.unpack_from(self._mm, self._records_pos + RECORD.size * index)[0]
+
+        if frame_num + 1 < len(self._frames) and index + 1 == self._first_records[frame_num + 1] \
+                or index + 1 == self._length:
+            return (start, raw_len)
+
+        return (start, RECORD.unpack_from(self._mm, self._records_pos + RECORD.size * (index + 1))[0])
+
+    def _load(self, index: int) -> Any:
+        frame_num = bisect.bisect_right(self._first_records, index) - 1
+        start, end = self._record_bounds(frame_num, index)
+
+        return pickle.loads(self._frame_data(frame_num)[start: end])
+
+    def _iter_frame(self, frame_num: int) -> Iterator[Any]:
+        _, _, raw_len, first_record = self._frames[frame_num]
+        last_record = self._first_records[frame_num + 1] if frame_num + 1 < len(self._frames) else self._length
+        offsets = struct.unpack_from(f'<{last_record - first_record}I', self._mm,
+                                     self._records_pos + RECORD.size * first_record) + (raw_len,)
+        data = memoryview(self._frame_data(frame_num))
+
+        for start, end in zip(offsets, offsets[1:]):
+            yield pickle.loads(data[start: end])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Any]:
+        for frame_num in range(len(self._frames)):
+            yield from self._iter_frame(frame_num)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Any, List[Any]]:
+        if isinstance(index, slice):
+            return [self._load(i) for i in range(self._length)[index]]
+
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('record index out of range')
+
+        return self._load(index)
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from typing import Tuple
 
 
 class Division:
@@ -11,10 +12,16 @@ class Division:
     def __eq__(self, other: Division) -> bool:
         return self.name == other.name
 
+    def __hash__(self) -> int:
+        return hash(self.name)
+
     @property
     def name(self) -> str:
         return self._name
 
+    def fingerprint(self) -> Tuple[str]:
+        return (self.name,)
+
 
 class Worker:
     def __init__(self, name: str):
@@ -26,6 +33,12 @@ class Worker:
     def __eq__(self, other: Worker) -> bool:
         return self.name == other.name
 
+    def __hash__(self) -> int:
+        return hash(self.name)
+
     @property
     def name(self) -> str:
         return self._name
+
+    def fingerprint(self) -> Tuple[str]:
+        return (self.name,)
@@ -1,41 +1,100 @@
 from __future__ import annotations
 from typing import *
 
-class Stream:
+
+class _Record:
+    __slots__ = ('_key', '_hash', '__weakref__')
+
+    def __init__(self, key: Tuple):
+        """
+        Immutable record, comparison key is built once and shared by all comparisons and hashing.
+        Records are compared only with records of the same kind
+        """
+        self._key = key
+        self._hash = hash(key)
+
+    def _same_kind(self, other: Any) -> bool:
+        """
+        This module is imported both as students and utils.students,
+        so records of one kind may have different, equally named classes
+        """
+        return type(other) is type(self) or (type(other).__qualname__ == type(self).__qualname__
+                                             and isinstance(getattr(other, '_key', None), tuple))
+
+    def fingerprint(self) -> Tuple:
+        return self._key
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        return self._key == other._key if self._same_kind(other) else NotImplemented
+
+    def __lt__(self, other: Any) -> bool:
+        return self._key < other._key if self._same_kind(other) else NotImplemented
+
+    def __le__(self, other: Any) -> bool:
+        return self._key <= other._key if self._same_kind(other) else NotImplemented
+
+    def __gt__(self, other: Any) -> bool:
+        return self._key > other._key if self._same_kind(other) else NotImplemented
+
+    def __ge__(self, other: Any) -> bool:
+        return self._key >= other._key if self._same_kind(other) else NotImplemented
+
+
+class Stream(_Record):
+    __slots__ = ()
+
     def __init__(self, specialty: str, course: int):
-        self.specialty = specialty
-        self.course = course
+        """
+        Comparison key is (course, specialty)
+        """
+        super().__init__((course, specialty))
 
     def __repr__(self) -> str:
         return f'{self.__class__.__name__}("{self.specialty}", {self.course})'
 
-    def __eq__(self, other: Stream) -> bool:
-        return (self.course, self.specialty) == (other.course, other.specialty)
+    def __reduce__(self) -> Tuple[type, Tuple[str, int]]:
+        return (self.__class__, (self.specialty, self.course))
+
+    @property
+    def specialty(self) -> str:
+        return self._key[1]
+
+    @property
+    def course(self) -> int:
+        return self._key[0]
 
-    def __lt__(self, other: Stream) -> bool:
-        return (self.course, self.specialty) < (other.course, other.specialty)
 
+class Student(_Record):
+    __slots__ = ()
 
-class Student:
     def __init__(self, surname: str, name: str, patronymic: str, avg: float):
-        self.surname = surname
-        self.name = name
-        self.patronymic = patronymic
-        self.avg = avg
+        """
+        Comparison key is (avg, surname, name, patronymic), avg is kept as float,
+        so equal students have equal fingerprints whether avg was given as int or float
+        """
+        super().__init__((float(avg), surname, name, patronymic))
 
     def __repr__(self) -> str:
         return f'{self.__class__.__name__}("{self.surname}", "{self.name}", "{self.patronymic}", {self.avg})'
 
-    def __eq__(self, other: Student) -> bool:
-        return (self.avg, self.surname, self.name, self.patronymic) == \
-               (other.avg, other.surname, other.name, other.patronymic)
+    def __reduce__(self) -> Tuple[type, Tuple[str, str, str, float]]:
+        return (self.__class__, (self.surname, self.name, self.patronymic, self.avg))
 
-    def __lt__(self, other: Student) -> bool:
-        return (self.avg, self.surname, self.name, self.patronymic) < \
-               (other.avg, other.surname, other.name, other.patronymic)
+    @property
+    def surname(self) -> str:
+        return self._key[1]
 
-    def __le__(self, other: Student) -> bool:
-        return (self.avg, self.surname, self.name, self.patronymic) <= \
-               (other.avg, other.surname, other.name, other.patronymic)
+    @property
+    def name(self) -> str:
+        return self._key[2]
 
+    @property
+    def patronymic(self) -> str:
+        return self._key[3]
 
+    @property
+    def avg(self) -> float:
+        return self._key[0]
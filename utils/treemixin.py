@@ -98,6 +98,26 @@ TKey = TypeVar('TKey')
 TValue = TypeVar('TValue')
 
 
+def build_balanced(runs: Sequence[Tuple[Any, List[Any]]],
+                   make_node: Callable[[Any, List[Any], Optional[NodeType], Optional[NodeType], int], NodeType],
+                   lo: int = 0, hi: Optional[int] = None, depth: int = 0) -> Optional[NodeType]:
+    """
+    Builds tree of runs[lo:hi] with median of the range in the root, so all levels except the last are full.
+    make_node gets key, values, both sons and depth of the node
+    """
+    if hi is None:
+        hi = len(runs)
+
+    if lo >= hi:
+        return None
+
+    mid = (lo + hi) // 2
+    lt = build_balanced(runs, make_node, lo, mid, depth + 1)
+    rt = build_balanced(runs, make_node, mid + 1, hi, depth + 1)
+
+    return make_node(*runs[mid], lt, rt, depth)
+
+
 class ImmutableBinTreeMixin(Generic[TKey, TValue]):
     def __init__(self):
         """
@@ -1,27 +1,81 @@
+import itertools
 import math
+import operator
+import os
 import pickle
 import random
 import string
 import struct
+import sys
+import weakref
 from functools import singledispatch
-from typing import Any, Iterator, List, Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Iterator, List, Callable, Iterable, Sequence, Optional, Tuple
 from collections import abc
 from array import array
 from staff import Division, Worker
 from students import Stream, Student
-from db.students_db import fetch_by_query
+from db.students_db import iter_by_query, add_write_listener, RowCache
+from framedio import FramedReader, write_frames, is_framed
+
+
+stream_cache = RowCache()
+add_write_listener(stream_cache.clear)
 
 
 def fetch_stream_students(stream: Stream) -> Iterator[Student]:
+    """
+    Results are kept in stream_cache, which is cleared by change_with_query.
+    On a miss rows are streamed and cached after the last one, unless there are more than the cache can hold
+    """
+    key = (stream.specialty, stream.course)
+    rows = stream_cache.get(key)
+
+    if rows is not None:
+        for stud in rows:
+            yield Student(*stud)
+        return
+
     query = f"""SELECT stud.surname, stud.name, stud.patronymic, stud.total 
                 FROM students stud LEFT JOIN streams s ON stud.stream_id=s.id 
                 WHERE s.name LIKE :spec AND s.course=:course"""
+    generation, rows = stream_cache.generation, []
+
+    for stud in iter_by_query(query, {'spec': f'{stream.specialty}%', 'course': stream.course}):
+        if rows is not None:
+            rows.append(stud)
+            if len(rows) > stream_cache.max_rows:
+                rows = None
 
-    for stud in fetch_by_query(query, {'spec': f'{stream.specialty}%', 'course': stream.course}):
         yield Student(*stud)
 
+    if rows is not None:
+        stream_cache.put(key, rows, generation)
+
+
+def fetch_grouped_students() -> Iterator[Tuple[Stream, List[Student]]]:
+    """
+    Students of all streams with one query, grouped by stream.
+    Stream names are trimmed and streams with equal specialty and course are merged, as in fetch_stream_students
+    """
+    query = """SELECT rtrim(s.name), s.course, stud.surname, stud.name, stud.patronymic, stud.total
+               FROM students stud JOIN streams s ON stud.stream_id=s.id
+               WHERE s.course IS NOT NULL
+               ORDER BY rtrim(s.name), s.course, stud.rowid"""
+
+    for (specialty, course), rows in itertools.groupby(iter_by_query(query, {}), key=lambda row: row[:2]):
+        yield (Stream(specialty, course), [Student(*row[2:]) for row in rows])
+
+
+def serialize_objects(filename: str, sequence: Iterable[Any], framed: bool = False,
+                      compression: Optional[str] = None) -> None:
+    """
+    Writes length prefixed pickles (version 1) or, with framed, indexed framed file (see framedio)
+    """
+    if framed or compression is not None:
+        write_frames(filename, sequence, compression)
+        return
 
-def serialize_objects(filename: str, sequence: Iterable[Any]) -> None:
     with open(filename, 'wb') as f:
         for obj in sequence:
             byte_repr = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
@@ -30,7 +84,21 @@ def serialize_objects(filename: str, sequence: Iterable[Any]) -> None:
             f.write(byte_repr)
 
 
-def deserialize_objects(filename: str) -> Iterator[Any]:
+def deserialize_objects(filename: str, workers: int = 0, ordered: bool = True) -> Iterator[Any]:
+    """
+    Yields objects written by serialize_objects.
+    With workers > 1 file is split into record ranges unpickled in a pool of that many processes,
+    then objects are yielded in file order or, unless ordered, as (index, object) pairs in completion order
+    """
+    if workers > 1:
+        yield from _deserialize_parallel(filename, workers, ordered)
+        return
+
+    if is_framed(filename):
+        with FramedReader(filename) as reader:
+            yield from reader
+        return
+
     with open(filename, 'rb') as f:
         while len(length := f.read(4)) == 4:
             repr_len = struct.unpack('@I', length)[0]
@@ -38,6 +106,90 @@ def deserialize_objects(filename: str) -> Iterator[Any]:
             yield pickle.loads(byte_repr)
 
 
+def deserialize_into(filename: str, build: Callable[[Iterator[Any]], Any], workers: int = 0) -> Any:
+    """
+    Passes objects of filename straight to build function (e.g. tree constructor) without intermediate list
+    """
+    return build(deserialize_objects(filename, workers))
+
+
+def _record_chunks(filename: str, chunk_count: int) -> List[Tuple[int, int, int]]:
+    """
+    Splits file into chunk_count ranges of records of about the same size.
+    Returns index of first record, start and end of every range:
+    record numbers for framed files, byte offsets (found by skipping records) for length prefixed ones
+    """
+    if is_framed(filename):
+        with FramedReader(filename) as reader:
+            length = len(reader)
+
+        bounds = sorted({length * i // chunk_count for i in range(chunk_count + 1)})
+        return [(start, start, end) for start, end in zip(bounds, bounds[1:])]
+
+    chunk_len = os.path.getsize(filename) / chunk_count
+    chunks, first, start, index, pos = [], 0, 0, 0, 0
+
+    with open(filename, 'rb') as f:
+        while len(length := f.read(4)) == 4:
+            pos = f.seek(struct.unpack('@I', length)[0], os.SEEK_CUR)
+            index += 1
+
+            if pos - start >= chunk_len:
+                chunks.append((first, start, pos))
+                first, start = index, pos
+
+    if pos > start:
+        chunks.append((first, start, pos))
+
+    return chunks
+
+
+def _load_chunk(filename: str, start: int, end: int) -> List[Any]:
+    if is_framed(filename):
+        with FramedReader(filename) as reader:
+            return reader[start: end]
+
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = memoryview(f.read(end - start))
+
+    objects, pos = [], 0
+    while pos < len(data):
+        repr_len = struct.unpack_from('@I', data, pos)[0]
+        objects.append(pickle.loads(data[pos + 4: pos + 4 + repr_len]))
+        pos += 4 + repr_len
+
+    return objects
+
+
+def _deserialize_parallel(filename: str, workers: int, ordered: bool) -> Iterator[Any]:
+    """
+    Keeps at most 2 * workers chunks in flight, so results don't pile up when consumer is slower than the pool
+    """
+    chunks = iter(_record_chunks(filename, 4 * workers))
+    pending: List[Tuple[int, Future]] = []
+
+    with ProcessPoolExecutor(workers) as executor:
+        def submit() -> None:
+            for first, start, end in chunks:
+                pending.append((first, executor.submit(_load_chunk, filename, start, end)))
+                if len(pending) >= 2 * workers:
+                    break
+
+        submit()
+        while len(pending) > 0:
+            if ordered:
+                first, future = pending.pop(0)
+                yield from future.result()
+            else:
+                done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                for first, future in [item for item in pending if item[1] in done]:
+                    pending.remove((first, future))
+                    yield from enumerate(future.result(), start=first)
+
+            submit()
+
+
 def gen_items(item_count: int, item_type: Any, init_func: Callable[[Any], Any]) -> List[Any]:
     items = []
 
@@ -49,23 +201,107 @@ def gen_items(item_count: int, item_type: Any, init_func: Callable[[Any], Any])
     return items
 
 
+UTF32 = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+SMALL_INT_BOUND = 2 ** 32
+
+
+def to_vector(obj: Any) -> Sequence[int]:
+    """
+    Encodes obj as sequence of unsigned 32 bit integers.
+    str, bytes and int keys skip singledispatch lookup,
+    other types can be added with to_vector.register
+    """
+    encoder = _FAST_ENCODERS.get(type(obj))
+    return encoder(obj) if encoder is not None else _encode(obj)
+
+
+class VectorCache:
+    def __init__(self) -> None:
+        """
+        Vectors of objects by their id. Entry is dropped as soon as its object is garbage collected,
+        objects which can't be weakly referenced are not cached
+        """
+        self._vectors = {}
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def get(self, obj: Any) -> Optional[Sequence[int]]:
+        entry = self._vectors.get(id(obj))
+        return entry[1] if entry is not None and entry[0]() is obj else None
+
+    def put(self, obj: Any, vector: Sequence[int]) -> None:
+        obj_id = id(obj)
+
+        try:
+            ref = weakref.ref(obj, lambda _: self._vectors.pop(obj_id, None))
+        except TypeError:
+            return
+
+        self._vectors[obj_id] = (ref, vector)
+
+    def clear(self) -> None:
+        self._vectors.clear()
+
+
+vector_cache = VectorCache()
+
+
 @singledispatch
-def to_vector(obj: Any) -> array:
-    return array('I', [sym for sym in pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)])
+def _encode(obj: Any) -> Sequence[int]:
+    """
+    Objects may define fingerprint() returning stable tuple of primitive fields which is encoded instead of
+    pickled object. Either way vector is cached while object is alive
+    """
+    if (vector := vector_cache.get(obj)) is not None:
+        return vector
+
+    fingerprint = getattr(obj, 'fingerprint', None)
+    if fingerprint is not None:
+        vector = to_vector(fingerprint())
+    else:
+        vector = array('I', [sym for sym in pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)])
+
+    vector_cache.put(obj, vector)
+    return vector
+
+
+@_encode.register
+def _encode_str(s: str) -> Sequence[int]:
+    """
+    Code points of s without building python list: utf-32 bytes viewed as unsigned ints
+    """
+    return memoryview(s.encode(UTF32, 'surrogatepass')).cast('I')
+
 
+@_encode.register
+def _encode_bytes(byte_str: bytes) -> Sequence[int]:
+    return memoryview(byte_str) if len(byte_str) > 0 else (0,)
 
-@to_vector.register
-def _(s: str) -> array:
-    return array('I', [ord(sym) for sym in s])
 
+@_encode.register
+def _encode_int(integer: int) -> Sequence[int]:
+    """
+    Small non-negative integers are one element vectors,
+    others are 32 bit limbs of absolute value followed by sign, so distinct integers never share a vector
+    """
+    if 0 <= integer < SMALL_INT_BOUND:
+        return (integer,)
 
-@to_vector.register
-def _(integer: int) -> array:
-    return array('I', [integer])
+    res, magnitude = array('I', []), abs(integer)
+    while magnitude > 0:
+        res.append(magnitude % SMALL_INT_BOUND)
+        magnitude //= SMALL_INT_BOUND
+    res.append(integer < 0)
 
+    return res
+
+
+@_encode.register
+def _encode_iterable(iterable: abc.Iterable) -> Sequence[int]:
+    if isinstance(iterable, (tuple, list)) and len(iterable) == 1 and len(vector := to_vector(iterable[0])) > 0:
+        return vector
 
-@to_vector.register
-def _(iterable: abc.Iterable) -> array:
     res = array('I', [])
 
     for obj in iterable:
@@ -74,6 +310,49 @@ def _(iterable: abc.Iterable) -> array:
     return res if len(res) > 0 else array('I', [0])
 
 
+_FAST_ENCODERS = {str: _encode_str, bytes: _encode_bytes, int: _encode_int,
+                  tuple: _encode_iterable, list: _encode_iterable}
+to_vector.register = _encode.register
+
+
+def poly_hash(vector: Sequence[int], a: int, prime: int) -> int:
+    """
+    Evaluates sum(a ** i * vector[i - 1]) % prime with Horner's rule,
+    reducing by prime on every step
+    """
+    res = 0
+
+    for val in reversed(vector):
+        res = (res + val) * a % prime
+
+    return res
+
+
+class PowerTable:
+    def __init__(self, base: int, prime: int) -> None:
+        self._base = base % prime
+        self._prime = prime
+        self._powers = [self._base]
+
+    def __len__(self) -> int:
+        return len(self._powers)
+
+    def _grow(self, length: int) -> None:
+        powers, base, prime = self._powers, self._base, self._prime
+
+        while len(powers) < length:
+            powers.append(powers[-1] * base % prime)
+
+    def poly_hash(self, vector: Sequence[int]) -> int:
+        """
+        Same value as poly_hash(vector, base, prime), but reuses precomputed powers of base
+        """
+        if len(vector) > len(self._powers):
+            self._grow(len(vector))
+
+        return sum(map(operator.mul, vector, self._powers)) % self._prime
+
+
 def rand_str(length: int) -> str:
     return random.choice(string.ascii_uppercase) + \
            ''.join(random.choice(string.ascii_lowercase) for _ in range(length - 1))